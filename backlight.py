@@ -0,0 +1,222 @@
+"""
+Controlling the backlight through sysfs
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+from libqtile.utils import create_task, dbus_bus_connections
+
+try:
+    from dbus_next import DBusError, Message
+    from dbus_next.aio import MessageBus
+    from dbus_next.constants import BusType
+    from dbus_next.errors import AuthError, InvalidAddressError
+
+    has_dbus = True
+except ImportError:
+    has_dbus = False
+
+if TYPE_CHECKING:
+    from offload import Executor
+
+BACKLIGHT_ROOT = "/sys/class/backlight"
+
+
+class Backlight:
+    """Reads and writes the brightness of the first backlight device
+
+    The device and its max_brightness are looked up once, when first used.
+    The brightness is read again before a change that starts from where it
+    is, as something else may have set it in the meantime. Changes are
+    batched into one write per frame, and a ramp spreads a change over
+    several frames. Writing to sysfs needs permission, otherwise logind's
+    SetBrightness is used instead.
+
+    Some drivers only return from a write once the panel has changed, so
+    with an executor the writes are made from its threads, in order."""
+
+    def __init__(
+        self,
+        root: str = BACKLIGHT_ROOT,
+        delay: float = 0.016,
+        ramp_time: float = 0,
+        executor: Executor | None = None,
+    ) -> None:
+        self.root = root
+        self.delay = delay
+        self.ramp_time = ramp_time
+        self.executor = executor
+        self.device: str | None = None
+        self.max_brightness = 0
+        self.brightness = 0
+        self.use_logind = False
+        self.bus: MessageBus | None = None
+        self._steps: list[int] = []
+        self._handle: asyncio.TimerHandle | None = None
+        self._writing = 0
+        self._found = False
+
+    def find(self) -> None:
+        """Look up the device and cache its brightness range, only done once"""
+        if self._found:
+            return
+
+        self._found = True
+
+        try:
+            devices = sorted(os.listdir(self.root))
+        except FileNotFoundError:
+            devices = []
+
+        if not devices:
+            logger.warning("No backlight device found in %s", self.root)
+            return
+
+        self.device = devices[0]
+        self.max_brightness = self._read("max_brightness")
+        self.brightness = self._read("brightness")
+
+    def _read(self, name: str) -> int:
+        with open(self._path(name), encoding="utf-8") as value_file:
+            return int(value_file.read())
+
+    def _path(self, name: str) -> str:
+        assert self.device is not None, "A device should have been found"
+        return os.path.join(self.root, self.device, name)
+
+    @property
+    def target(self) -> int:
+        """Where the brightness ends up once pending writes are done"""
+        return self._steps[-1] if self._steps else self.brightness
+
+    def set_percent(self, percent: float, ramp_time: float | None = None) -> None:
+        """Set the brightness to a percentage of the maximum"""
+        self.find()
+
+        if self.device is None:
+            return
+
+        value = round(self.max_brightness * percent / 100)
+        value = min(max(value, 0), self.max_brightness)
+
+        ramp_time = self.ramp_time if ramp_time is None else ramp_time
+        frames = max(int(ramp_time / self.delay), 1)
+        start = self.target
+
+        self._steps = [
+            start + round((value - start) * frame / frames)
+            for frame in range(1, frames + 1)
+        ]
+        self._schedule()
+
+    def change(self, percent: float) -> None:
+        """Raise or lower the brightness by a percentage of the maximum"""
+        self.find()
+
+        if self.device is None or not self.max_brightness:
+            return
+
+        if not self._steps and self._handle is None and not self._writing:
+            try:
+                self.brightness = self._read("brightness")
+            except (OSError, ValueError):
+                logger.warning("Unable to read the brightness of %s", self.device)
+
+        self.set_percent(self.target * 100 / self.max_brightness + percent)
+
+    def _schedule(self) -> None:
+        if self._handle is not None:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Nothing to batch on without an event loop, write straight away
+            while self._steps:
+                self.flush()
+            return
+
+        self._handle = loop.call_later(self.delay, self.flush)
+
+    def flush(self) -> None:
+        """Write the next step and schedule the rest of the ramp"""
+        self._handle = None
+
+        if not self._steps:
+            return
+
+        value = self._steps.pop(0)
+
+        if value != self.brightness:
+            self._write(value)
+
+        if self._steps:
+            self._schedule()
+
+    def _write(self, value: int) -> None:
+        self.brightness = value
+
+        if self.use_logind:
+            create_task(self._set_logind(value))
+        elif self.executor is not None:
+            create_task(self._write_off_loop(value))
+        elif not self._write_sysfs(value):
+            self._fall_back(value)
+
+    def _write_sysfs(self, value: int) -> bool:
+        """Whether writing to sysfs is allowed"""
+        try:
+            with open(self._path("brightness"), "w", encoding="utf-8") as output:
+                output.write(str(value))
+        except PermissionError:
+            return False
+        return True
+
+    async def _write_off_loop(self, value: int) -> None:
+        assert self.executor is not None, "Only written off the loop with an executor"
+        path = self._path("brightness")
+        self._writing += 1
+        try:
+            written = await self.executor.run(path, self._write_sysfs, value)
+        finally:
+            self._writing -= 1
+        if not written:
+            self._fall_back(value)
+
+    def _fall_back(self, value: int) -> None:
+        if not self.use_logind:
+            logger.info("No permission to write brightness, using logind")
+            self.use_logind = True
+
+        create_task(self._set_logind(value))
+
+    async def _set_logind(self, value: int) -> None:
+        """Ask logind to set the brightness for this session"""
+        if not has_dbus:
+            logger.warning("dbus-next is not installed. Unable to set brightness.")
+            return
+
+        if self.bus is None:
+            try:
+                self.bus = await MessageBus(bus_type=BusType.SYSTEM).connect()
+            except (OSError, AuthError, DBusError, InvalidAddressError):
+                logger.warning("Unable to connect to dbus for brightness.")
+                return
+
+            dbus_bus_connections.add(self.bus)
+
+        self.bus.send(
+            Message(
+                destination="org.freedesktop.login1",
+                path="/org/freedesktop/login1/session/auto",
+                interface="org.freedesktop.login1.Session",
+                member="SetBrightness",
+                signature="ssu",
+                body=["backlight", self.device, value],
+            )
+        )
@@ -0,0 +1,214 @@
+"""
+Throughput of the config's hooks and key functions as windows pile up
+
+The real handlers run against FakeQtile, driven by storms of the events
+qtile would fire, without a compositor or a Wayland session. Each storm
+ends with the bar flushes it caused, so rendering is part of the cost.
+Afterwards the group cache is checked against a full scan, and `drift`
+counts the differences, which should always be 0.
+
+    python benchmarks/bench_hooks.py [--windows 5 50 500] [--screens N] [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import itertools
+import os
+import sys
+import tempfile
+import time
+from typing import TYPE_CHECKING
+
+from fakeqtile import FakeQtile, FakeWindow, clear, fire, install
+
+if TYPE_CHECKING:
+    import types
+    from collections.abc import Callable
+
+WINDOW_COUNTS = (5, 20, 50, 100, 200, 500)
+
+# A mix of windows that are moved by the placement rules and ones that stay
+CLASSES = (
+    ["foot", "foot"],
+    ["firefox", "firefox"],
+    ["Signal", "signal"],
+    ["steam", "Steam"],
+    ["Spotify", "spotify"],
+    ["imv", "imv"],
+    ["org.gnome.Nautilus", "Nautilus"],
+    None,
+)
+
+
+def populate(config: types.ModuleType, qtile: FakeQtile, windows: int) -> None:
+    """Open windows spread over the groups, as a session would have them"""
+    groups = [group for group in qtile.groups if group.name != "scratchpad"]
+    classes = itertools.cycle(CLASSES)
+
+    for index in range(windows):
+        qtile.current_screen.set_group(groups[index % len(groups)])
+        qtile.manage(FakeWindow(qtile, next(classes), f"window {index}"))
+
+    qtile.current_screen.set_group(groups[0])
+    config.bars.flush()
+
+
+def focus_cycle(config: types.ModuleType, qtile: FakeQtile) -> int:
+    """Focus every window of the current group in turn, a few times over"""
+    group = qtile.current_group
+    windows: list[FakeWindow | None] = [*group.windows] or [None]
+    rounds = max(1000 // len(windows), 1)
+
+    for window in windows * rounds:
+        if window is not None:
+            group.focus(window)
+
+    return len(windows) * rounds
+
+
+def client_burst(config: types.ModuleType, qtile: FakeQtile) -> int:
+    """200 windows showing up at once"""
+    classes = itertools.cycle(CLASSES)
+    for index in range(200):
+        qtile.manage(FakeWindow(qtile, next(classes), f"burst {index}"))
+    return 200
+
+
+def title_flood(config: types.ModuleType, qtile: FakeQtile) -> int:
+    """Every window retitles itself, the focused one most of all"""
+    windows = list(qtile.windows_map.values())
+    current = qtile.current_window
+    events = 0
+
+    for index in range(1000):
+        window = current if current is not None and index % 2 else None
+        qtile.rename(window or windows[index % len(windows)], f"title {index}")
+        events += 1
+
+    return events
+
+
+def layout_toggles(config: types.ModuleType, qtile: FakeQtile) -> int:
+    """Flip between max and the default layout"""
+    for _ in range(500):
+        config.toggle_layout(qtile, config.layout_names["max"])
+    return 500
+
+
+def spawn_or_focus(config: types.ModuleType, qtile: FakeQtile) -> int:
+    """Jump to running applications from the keyboard"""
+    apps = (
+        "firefox",
+        "signal-desktop",
+        "steam-native",
+        "flatpak run com.spotify.Client",
+    )
+    for app in apps * 250:
+        config.spawn_or_focus(qtile, app)
+    return len(apps) * 250
+
+
+def game(config: types.ModuleType, qtile: FakeQtile) -> int:
+    """A fullscreen game retitling itself and taking focus, with game mode on"""
+    qtile.current_screen.set_group(qtile.groups_map[config.GAME_GROUP])
+    window = FakeWindow(qtile, ["steam_app_0", "steam_app_0"], "game")
+    qtile.manage(window)
+    window.toggle_fullscreen()
+
+    for index in range(1000):
+        qtile.rename(window, f"game {index}")
+        qtile.current_group.focus(window)
+
+    window.toggle_fullscreen()
+    return 2000
+
+
+STORMS: dict[str, Callable[[types.ModuleType, FakeQtile], int]] = {
+    "focus": focus_cycle,
+    "client_new": client_burst,
+    "titles": title_flood,
+    "layouts": layout_toggles,
+    "spawn_or_focus": spawn_or_focus,
+    "game": game,
+}
+
+
+def load(qtile: FakeQtile, screens: int) -> types.ModuleType:
+    """Run the config from scratch for the fake session"""
+    clear()
+    if "config" in sys.modules:
+        config = importlib.reload(sys.modules["config"])
+    else:
+        config = importlib.import_module("config")
+
+    qtile.reset(
+        [group.name for group in config.groups],
+        list(config.layout_names.values()),
+        screens,
+    )
+    fire("startup_complete")
+    return config
+
+
+def published(config: types.ModuleType) -> int:
+    """Flushes of all bars that actually sent something"""
+    return sum(
+        stats["flushes"] - stats["unchanged"] for stats in config.bars.stats.values()
+    )
+
+
+async def run(qtile: FakeQtile, windows: int, screens: int, storm: str) -> tuple:
+    """Time one storm on a session with the given number of windows"""
+    config = load(qtile, screens)
+    populate(config, qtile, windows)
+    flushes = published(config)
+
+    start = time.perf_counter()
+    events = STORMS[storm](config, qtile)
+    config.bars.flush()
+    elapsed = time.perf_counter() - start
+
+    drift = len(config.group_cache.verify(qtile))
+    return events, elapsed, published(config) - flushes, drift
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--windows", type=int, nargs="+", default=WINDOW_COUNTS)
+    parser.add_argument("--screens", type=int, default=1)
+    parser.add_argument("--storms", nargs="+", choices=STORMS, default=list(STORMS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Keep the bar socket out of the way of a running session
+    os.environ["XDG_RUNTIME_DIR"] = tempfile.mkdtemp(prefix="qtile-bench-")
+
+    qtile = FakeQtile()
+    install(qtile)
+
+    print(
+        f"{'storm':<16} {'windows':>7} {'events':>7} {'total ms':>9}"
+        f" {'us/event':>9} {'events/s':>10} {'flushes':>7} {'drift':>5}"
+    )
+    for storm in args.storms:
+        for windows in args.windows:
+            # The fastest run is the one least disturbed by everything else
+            events, elapsed, flushes, drift = min(
+                (
+                    asyncio.run(run(qtile, windows, args.screens, storm))
+                    for _ in range(args.repeat)
+                ),
+                key=lambda result: result[1],
+            )
+            print(
+                f"{storm:<16} {windows:>7} {events:>7} {elapsed * 1000:>9.2f}"
+                f" {elapsed / events * 1e6:>9.2f} {events / elapsed:>10.0f}"
+                f" {flushes:>7} {drift:>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
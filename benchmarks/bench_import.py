@@ -0,0 +1,132 @@
+"""
+How long it takes to import and to reload the config
+
+Cold imports run in a fresh interpreter each time. Reloads follow what
+qtile does on reload_config: every module next to the config is reloaded,
+then the config itself, and all of that twice. Applying settings is what
+saving settings.toml costs instead, with every section changed.
+
+    python benchmarks/bench_import.py [--runs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import os
+import statistics
+import subprocess
+import sys
+import time
+import types
+
+from fakeqtile import REPO, FakeQtile, clear, install
+
+COLD_IMPORT = """
+import sys, time
+sys.path.insert(0, {bench!r})
+import fakeqtile
+fakeqtile.install(object())
+start = time.perf_counter()
+import config
+print(time.perf_counter() - start)
+"""
+
+
+def cold_import(runs: int) -> list[float]:
+    """Seconds spent importing the config in a fresh interpreter"""
+    code = COLD_IMPORT.format(bench=os.path.dirname(os.path.abspath(__file__)))
+    return [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", code],
+                check=True,
+                capture_output=True,
+                text=True,
+                cwd=REPO,
+            ).stdout.split()[-1]
+        )
+        for _ in range(runs)
+    ]
+
+
+def reload_config(config: types.ModuleType) -> None:
+    """Reload the config the same way qtile's Config.load does"""
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if (
+            path is not None
+            and module is not config
+            and os.path.dirname(os.path.abspath(path)) == REPO
+        ):
+            importlib.reload(module)
+
+    importlib.reload(config)
+
+
+def reloads(runs: int) -> list[float]:
+    """Seconds spent on what a reload_config runs of the config"""
+    install(object())
+    import config
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        reload_config(config)
+        clear()
+        reload_config(config)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def applies(runs: int) -> list[float]:
+    """Seconds spent applying changes to every section of the settings"""
+    install(
+        FakeQtile(
+            groups=("1", "2", "3", "4", "5", "6", "scratchpad"),
+            layouts=("tall~", "max~", "tree~"),
+        )
+    )
+    import config
+
+    reload_config(config)
+
+    original = config.settings.data
+    changed = {
+        "colors": dict(zip(original["colors"], reversed(original["colors"].values()))),
+        "groups": {**original["groups"], "6": ["newsboat"]},
+        "float_rules": [*original["float_rules"], {"wm_class": "mpv"}],
+        "scratchpad": {**original["scratchpad"], "height": 0.5},
+    }
+
+    timings = []
+    for run in range(runs):
+        start = time.perf_counter()
+        config.settings.apply(original if run % 2 else changed)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    """Print a line of statistics in milliseconds"""
+    ms = [timing * 1000 for timing in timings]
+    print(
+        f"{name:<12} min {min(ms):8.2f} ms  median {statistics.median(ms):8.2f} ms"
+        f"  max {max(ms):8.2f} ms  ({len(ms)} runs)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    report("cold import", cold_import(args.runs))
+    report("reload", reloads(args.runs))
+    report("apply", applies(args.runs))
+
+
+if __name__ == "__main__":
+    main()
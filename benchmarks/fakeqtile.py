@@ -0,0 +1,394 @@
+"""
+A stand-in for libqtile, so the config can be loaded without a compositor
+
+Only what the config touches is provided. Hooks are real enough to be
+fired, everything configuration related simply stores its arguments.
+FakeQtile models screens, groups and windows, and fires the same hooks
+qtile does when windows come and go.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import sys
+import types
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any, ClassVar
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+subscriptions: defaultdict[str, list[Callable]] = defaultdict(list)
+
+
+class _Subscribe:
+    def __getattr__(self, name: str) -> Callable:
+        def subscribe(func: Callable) -> Callable:
+            if func not in subscriptions[name]:
+                subscriptions[name].append(func)
+            return func
+
+        return subscribe
+
+
+# Hooks being handled right now, and whether hooks fired by their handlers
+# are passed on. A replayed log already holds those, so they are dropped.
+firing = 0
+nested = True
+
+
+def fire(event: str, *args: Any) -> None:
+    """Call every handler of a hook the way qtile does"""
+    global firing
+
+    if firing and not nested:
+        return
+
+    firing += 1
+    try:
+        for handler in subscriptions[event].copy():
+            if asyncio.iscoroutinefunction(handler):
+                try:
+                    asyncio.get_running_loop().create_task(handler(*args))
+                except RuntimeError:
+                    continue
+            else:
+                handler(*args)
+    finally:
+        firing -= 1
+
+
+def clear() -> None:
+    """Forget all subscriptions, as a config reload does"""
+    subscriptions.clear()
+
+
+def create_task(coro: Any) -> asyncio.Task | None:
+    """Schedule a coroutine on the running loop, like libqtile.utils.create_task"""
+    try:
+        return asyncio.get_running_loop().create_task(coro)
+    except RuntimeError:
+        coro.close()
+        return None
+
+
+class Stored:
+    """Configuration objects only keep what they were given"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.args = args
+        self.kwargs = kwargs
+        if args and isinstance(args[0], str):
+            self.name = args[0]
+        self.__dict__.update(kwargs)
+
+
+class Floating(Stored):
+    default_float_rules: ClassVar[list[Stored]] = []
+
+
+class Match(Stored):
+    def compare(self, window: Any) -> bool:
+        wm_class = getattr(self, "wm_class", None)
+        return wm_class is not None and wm_class in (window.get_wm_class() or ())
+
+
+class Window:
+    """Base of the fake windows, so isinstance checks in the config work"""
+
+
+class Lazy:
+    """Absorbs any lazy.x.y(...).when(...) chain"""
+
+    def __getattr__(self, _name: str) -> Lazy:
+        return self
+
+    def __call__(self, *_args: Any, **_kwargs: Any) -> Lazy:
+        return self
+
+    def __getitem__(self, _key: Any) -> Lazy:
+        return self
+
+
+def _module(name: str, **attributes: Any) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    module.__path__ = []  # type: ignore[attr-defined]
+    sys.modules[name] = module
+    return module
+
+
+def install(qtile: Any = None) -> types.ModuleType:
+    """Put the stand-in modules in place of libqtile and make the config importable"""
+    hook = _module("libqtile.hook", subscribe=_Subscribe(), fire=fire, clear=clear)
+    libqtile = _module("libqtile", hook=hook, qtile=qtile)
+
+    _module("libqtile.log_utils", logger=logging.getLogger("libqtile"))
+    _module(
+        "libqtile.utils",
+        create_task=create_task,
+        dbus_bus_connections=set(),
+    )
+    _module("libqtile.backend")
+    _module("libqtile.backend.base", Window=Window)
+    _module("libqtile.backend.wayland", InputConfig=Stored)
+    _module(
+        "libqtile.config",
+        Match=Match,
+        **{
+            name: type(name, (Stored,), {})
+            for name in (
+                "Click",
+                "Drag",
+                "DropDown",
+                "Group",
+                "Key",
+                "ScratchPad",
+                "Screen",
+            )
+        },
+    )
+    _module("libqtile.group", _Group=type("_Group", (), {}))
+    _module("libqtile.layout")
+    _module("libqtile.layout.floating", Floating=Floating)
+    _module("libqtile.layout.max", Max=type("Max", (Stored,), {}))
+    _module("libqtile.layout.tree", TreeTab=type("TreeTab", (Stored,), {}))
+    _module("libqtile.layout.xmonad", MonadTall=type("MonadTall", (Stored,), {}))
+    _module("libqtile.lazy", lazy=Lazy())
+
+    if REPO not in sys.path:
+        sys.path.insert(0, REPO)
+
+    return libqtile
+
+
+class FakeLayout:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def hide(self) -> None:
+        pass
+
+    def show(self, _rect: Any) -> None:
+        pass
+
+    def down(self) -> None:
+        pass
+
+    def swap_main(self) -> None:
+        pass
+
+
+class FakeGroup:
+    def __init__(self, qtile: FakeQtile, name: str, layouts: list[str]) -> None:
+        self.qtile = qtile
+        self.name = self.label = name
+        self.windows: list[FakeWindow] = []
+        self.layouts = [FakeLayout(layout) for layout in layouts]
+        self.layout = self.layouts[0]
+        self.floating_layout = Floating()
+        self.screen: FakeScreen | None = None
+        self.current_window: FakeWindow | None = None
+
+    def add(self, window: FakeWindow) -> None:
+        fire("group_window_add", self, window)
+        self.windows.append(window)
+        window.group = self
+
+    def remove(self, window: FakeWindow) -> None:
+        self.windows.remove(window)
+        if self.current_window is window:
+            self.current_window = self.windows[-1] if self.windows else None
+
+    def focus(self, window: FakeWindow) -> None:
+        self.current_window = window
+        fire("client_focus", window)
+        fire("focus_change")
+
+    def layout_all(self) -> None:
+        pass
+
+    def toscreen(self, toggle: bool = False) -> None:
+        self.qtile.current_screen.set_group(self)
+
+    def setlayout(self, name: str) -> None:
+        self.layout = next(layout for layout in self.layouts if layout.name == name)
+        fire("layout_change", self.layout, self)
+
+    def _neighbour(self, step: int) -> FakeGroup:
+        groups = self.qtile.groups
+        return groups[(groups.index(self) + step) % len(groups)]
+
+    def get_next_group(self, skip_empty: bool = False) -> FakeGroup:
+        return self._neighbour(1)
+
+    def get_previous_group(self, skip_empty: bool = False) -> FakeGroup:
+        return self._neighbour(-1)
+
+
+class FakeScratchPad(FakeGroup):
+    """The dropdown state of libqtile.scratchpad.ScratchPad, with no dropdowns"""
+
+    def __init__(self, qtile: FakeQtile, name: str, layouts: list[str]) -> None:
+        super().__init__(qtile, name, layouts)
+        self._dropdownconfig: dict[str, Any] = {}
+        self.dropdowns: dict[str, Any] = {}
+        self._spawned: dict[str, Any] = {}
+        self._to_hide: list[str] = []
+
+    def dropdown_toggle(self, name: str) -> None:
+        if name not in self.dropdowns and name in self._dropdownconfig:
+            self._spawn(self._dropdownconfig[name])
+
+    def dropdown_reconfigure(self, name: str, **kwargs: Any) -> None:
+        self._dropdownconfig[name].__dict__.update(kwargs)
+
+    def _spawn(self, ddconfig: Any) -> None:
+        if ddconfig.name in self._spawned:
+            return
+        self._spawned[ddconfig.name] = ddconfig.match
+        self.qtile.spawn(ddconfig.command)
+
+
+class FakeScreen:
+    def __init__(self, index: int, group: FakeGroup) -> None:
+        self.index = index
+        self.x = 1920 * index
+        self.y = 0
+        self.group = group
+        group.screen = self
+
+    def set_group(self, group: FakeGroup) -> None:
+        if group is self.group:
+            return
+
+        self.group.screen = None
+        self.group = group
+        group.screen = self
+        fire("setgroup")
+        fire("focus_change")
+
+    def get_rect(self) -> tuple[int, int, int, int]:
+        return (self.x, self.y, 1920, 1080)
+
+
+class FakeWindow(Window):
+    _ids = itertools.count(1)
+
+    def __init__(
+        self, qtile: FakeQtile, wm_class: list[str] | None, name: str = ""
+    ) -> None:
+        self.qtile = qtile
+        self.wid = next(self._ids)
+        self.wm_class = wm_class
+        self.name = name
+        self.group: FakeGroup | None = None
+        self.floating = False
+        self.fullscreen = False
+
+    def get_wm_class(self) -> list[str] | None:
+        return self.wm_class
+
+    def togroup(self, group: str) -> None:
+        if self.group is not None:
+            self.group.remove(self)
+        self.qtile.groups_map[group].add(self)
+
+    def toggle_fullscreen(self) -> None:
+        self.fullscreen = not self.fullscreen
+        fire("float_change")
+
+    def bring_to_front(self) -> None:
+        pass
+
+    def center(self) -> None:
+        pass
+
+
+class FakeQtile:
+    """Screens, groups and windows, without anything to draw them on
+
+    The config holds on to the qtile object from its first import, so the
+    same object is reset for every run instead of being replaced."""
+
+    def __init__(
+        self,
+        groups: list[str] | tuple[str, ...] = ("1",),
+        layouts: list[str] | tuple[str, ...] = ("tile",),
+        screens: int = 1,
+    ) -> None:
+        self.core = types.SimpleNamespace(
+            _current_output=types.SimpleNamespace(organise_layers=lambda: None)
+        )
+        self.reset(groups, layouts, screens)
+
+    def reset(
+        self,
+        groups: list[str] | tuple[str, ...],
+        layouts: list[str] | tuple[str, ...],
+        screens: int = 1,
+    ) -> None:
+        """Start over with empty groups"""
+        self.groups = [
+            (FakeScratchPad if name == "scratchpad" else FakeGroup)(
+                self, name, list(layouts)
+            )
+            for name in groups
+        ]
+        self.groups_map = {group.name: group for group in self.groups}
+        self.screens = [
+            FakeScreen(index, self.groups[index]) for index in range(screens)
+        ]
+        self.current_screen = self.screens[0]
+        self.windows_map: dict[int, FakeWindow] = {}
+        self.spawned: list[str] = []
+
+    @property
+    def current_group(self) -> FakeGroup:
+        return self.current_screen.group
+
+    @property
+    def current_layout(self) -> FakeLayout:
+        return self.current_group.layout
+
+    @property
+    def current_window(self) -> FakeWindow | None:
+        return self.current_group.current_window
+
+    def spawn(self, command: str) -> None:
+        self.spawned.append(command)
+
+    def warp_to_screen(self) -> None:
+        pass
+
+    def to_layout_index(self, index: int, group: str) -> None:
+        self.groups_map[group].setlayout(self.groups_map[group].layouts[index].name)
+
+    def manage(self, window: FakeWindow) -> None:
+        """A new window shows up, placed on the current group unless a hook moves it"""
+        fire("client_new", window)
+        self.windows_map[window.wid] = window
+        if window.group is None:
+            self.current_group.add(window)
+        fire("client_managed", window)
+        if window.group is self.current_group:
+            self.current_group.focus(window)
+
+    def kill(self, window: FakeWindow) -> None:
+        """A window goes away"""
+        assert window.group is not None, "Only managed windows can be killed"
+        window.group.remove(window)
+        del self.windows_map[window.wid]
+        fire("client_killed", window)
+        fire("focus_change")
+
+    def rename(self, window: FakeWindow, name: str) -> None:
+        """A window changes its title"""
+        window.name = name
+        fire("client_name_updated", window)
@@ -0,0 +1,215 @@
+"""
+Replay a recorded hook log through the config
+
+Record a log by starting qtile with QTILE_RECORD_HOOKS set to a file, then
+play it back here against FakeQtile, as fast as possible or at the pace it
+was recorded, to compare changes to the config on a real workload.
+Afterwards the group cache is checked against a full scan of the replayed
+session, and any drift is listed.
+
+    python benchmarks/replay.py hooks.log [--speed recorded] [--slowest N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+import fakeqtile
+from bench_hooks import load
+from fakeqtile import FakeGroup, FakeQtile, FakeWindow, fire, install
+
+if TYPE_CHECKING:
+    import types
+    from typing import Any
+
+
+class Session:
+    """Brings FakeQtile in line with what a log entry says, without firing hooks"""
+
+    def __init__(self, qtile: FakeQtile) -> None:
+        self.qtile = qtile
+        self.windows: dict[int, FakeWindow] = {}
+
+    def group(self, name: str) -> FakeGroup:
+        if name not in self.qtile.groups_map:
+            layouts = [layout.name for layout in self.qtile.groups[0].layouts]
+            group = FakeGroup(self.qtile, name, layouts)
+            self.qtile.groups.append(group)
+            self.qtile.groups_map[name] = group
+        return self.qtile.groups_map[name]
+
+    def show(self, name: str) -> None:
+        screen = self.qtile.current_screen
+        group = self.group(name)
+        if screen.group is not group:
+            screen.group.screen = None
+            screen.group = group
+            group.screen = screen
+
+    def window(self, snapshot: dict[str, Any]) -> FakeWindow:
+        window = self.windows.get(snapshot["w"])
+        if window is None:
+            window = FakeWindow(self.qtile, snapshot["c"])
+            window.wid = snapshot["w"]
+            self.windows[window.wid] = window
+            self.qtile.windows_map[window.wid] = window
+
+        window.wm_class = snapshot["c"]
+        window.name = snapshot["n"]
+        window.floating = bool(snapshot["f"])
+        window.fullscreen = bool(snapshot["F"])
+
+        group = None if snapshot["g"] is None else self.group(snapshot["g"])
+        if window.group is not group:
+            if window.group is not None and window in window.group.windows:
+                window.group.windows.remove(window)
+            if group is not None:
+                group.windows.append(window)
+            window.group = group
+
+        return window
+
+    def argument(self, snapshot: Any) -> Any:
+        if snapshot is None:
+            return None
+        if "w" in snapshot:
+            return self.window(snapshot)
+        if "group" in snapshot:
+            return self.group(snapshot["group"])
+        layouts = self.qtile.current_group.layouts
+        return next(
+            (layout for layout in layouts if layout.name == snapshot["layout"]),
+            layouts[0],
+        )
+
+    def apply(
+        self, hook: str, current_group: str, current_window: int | None, args: list
+    ) -> tuple:
+        """The arguments to fire the hook with, once the session matches the entry"""
+        self.show(current_group)
+        arguments = tuple(self.argument(arg) for arg in args)
+
+        if hook == "layout_change" and len(arguments) == 2:
+            layout, group = arguments
+            group.layout = next(
+                (each for each in group.layouts if each.name == layout.name), layout
+            )
+            arguments = (group.layout, group)
+
+        if hook == "client_killed":
+            # qtile has already taken the window out of its group by now
+            window = arguments[0]
+            if window.group is not None and window in window.group.windows:
+                window.group.windows.remove(window)
+            self.qtile.windows_map.pop(window.wid, None)
+            self.windows.pop(window.wid, None)
+
+        group = self.qtile.current_group
+        group.current_window = (
+            None if current_window is None else self.windows.get(current_window)
+        )
+
+        return arguments
+
+
+async def replay(
+    config: types.ModuleType, qtile: FakeQtile, entries: list[list], recorded: bool
+) -> list[tuple[float, int, str]]:
+    """Fire every entry, returning how long each one took"""
+    session = Session(qtile)
+    timings = []
+    start = time.monotonic()
+    offset = 0.0
+    previous = 0.0
+
+    for index, (stamp, hook, current_group, current_window, args) in enumerate(entries):
+        if recorded:
+            # Timestamps start over when recording was restarted
+            if stamp < previous:
+                offset += previous
+            previous = stamp
+            delay = start + offset + stamp - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        arguments = session.apply(hook, current_group, current_window, args)
+
+        begin = time.perf_counter()
+        fire(hook, *arguments)
+        timings.append((time.perf_counter() - begin, index, hook))
+
+    begin = time.perf_counter()
+    config.bars.flush()
+    timings.append((time.perf_counter() - begin, len(entries), "bar flush"))
+
+    return timings
+
+
+def report(timings: list[tuple[float, int, str]], wall: float, slowest: int) -> None:
+    """Totals per hook and the slowest single events"""
+    total = sum(timing for timing, _, _ in timings)
+    print(
+        f"{len(timings) - 1} events, {total * 1000:.2f} ms in handlers,"
+        f" {wall * 1000:.2f} ms wall, {total / len(timings) * 1e6:.2f} us per event"
+    )
+
+    per_hook: defaultdict[str, list[float]] = defaultdict(list)
+    for timing, _, hook in timings:
+        per_hook[hook].append(timing)
+
+    print(f"\n{'hook':<30} {'count':>7} {'total ms':>9} {'mean us':>9} {'max us':>9}")
+    for hook, hook_timings in sorted(
+        per_hook.items(), key=lambda item: sum(item[1]), reverse=True
+    ):
+        print(
+            f"{hook:<30} {len(hook_timings):>7} {sum(hook_timings) * 1000:>9.2f}"
+            f" {sum(hook_timings) / len(hook_timings) * 1e6:>9.2f}"
+            f" {max(hook_timings) * 1e6:>9.2f}"
+        )
+
+    print(f"\n{'slowest events':<30} {'entry':>7} {'us':>9}")
+    for timing, index, hook in sorted(timings, reverse=True)[:slowest]:
+        print(f"{hook:<30} {index:>7} {timing * 1e6:>9.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("log")
+    parser.add_argument("--speed", choices=("max", "recorded"), default="max")
+    parser.add_argument("--slowest", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.log, encoding="utf-8") as log:
+        entries = [json.loads(line) for line in log if line.strip()]
+
+    # Neither record the replay nor touch the bar of a running session
+    os.environ.pop("QTILE_RECORD_HOOKS", None)
+    os.environ["XDG_RUNTIME_DIR"] = tempfile.mkdtemp(prefix="qtile-replay-")
+
+    qtile = FakeQtile()
+    install(qtile)
+    config = load(qtile, screens=1)
+    fakeqtile.nested = False
+
+    start = time.perf_counter()
+    timings = asyncio.run(replay(config, qtile, entries, args.speed == "recorded"))
+    wall = time.perf_counter() - start
+
+    report(timings, wall, args.slowest)
+    print(f"\n{config.profiler.report(args.slowest)}")
+
+    problems = config.group_cache.verify(qtile)
+    print(f"\ngroup cache: {len(problems)} differences from a full scan")
+    for problem in problems:
+        print(f"  {problem}")
+
+
+if __name__ == "__main__":
+    main()
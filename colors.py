@@ -1,11 +0,0 @@
-"""
-Defining colors
-"""
-
-colors = {
-    "primary": "#B6AFC9",
-    "secondary": "#54546D",
-    "background": "#1D1D16",
-    "text": "#D9E0EE",
-    "urgent": "#E46876",
-}
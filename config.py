@@ -3,9 +3,10 @@
 from __future__ import annotations
 
 import os
-import random
-import subprocess
+import shlex
 from enum import Enum
+from functools import lru_cache, partial
+from html import escape
 from typing import TYPE_CHECKING
 
 from libqtile import hook, qtile
@@ -24,44 +25,132 @@ from libqtile.config import (
 from libqtile.group import _Group
 from libqtile.layout.floating import Floating
 from libqtile.layout.max import Max
-from libqtile.layout.tree import TreeTab
 from libqtile.layout.xmonad import MonadTall
 from libqtile.lazy import lazy
-
-from colors import colors
+from libqtile.utils import create_task
+
+from backlight import Backlight
+from gamemode import GameMode
+from groupstate import GroupCache
+from layouts import CachedTreeTab
+from mpris import MprisController
+from notifications import Notifier
+from offload import Executor
+from profiling import Profiler, Watchdog
+from recorder import HookRecorder
+from rules import PlacementRules
+from settings import Settings
+from status import StatusNotifications, WifiStatus
+from statusbar import OutputBars, StatusChannel
+from supervisor import Service, Supervisor
+from urgency import Urgency, UrgencyPolicy
+from volume import VolumeController
+from wallpapers import LockImages, WallpaperIndex
+from warmpool import TerminalServer, WarmPool
+from windowindex import ClassIndex
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
     from typing import Any
 
+    from libqtile.config import _Match
     from libqtile.core.manager import Qtile
 
 assert qtile is not None, "This should never be None."
 
+# A reload runs this module again in the same namespace, so close anything
+# the previous run left connected before replacing it
+for previous in (
+    globals().get(name)
+    for name in (
+        "bars",
+        "volume",
+        "wallpapers",
+        "warm_pool",
+        "media_channel",
+        "game_mode",
+        "settings",
+        "watchdog",
+    )
+):
+    if previous is not None:
+        previous.close()
+
+# Every hook handler and key function is timed, keeping the numbers across
+# reloads. Look at them with:
+# qtile cmd-obj -o root -f eval -a "__import__('config').profiler.report()"
+# qtile cmd-obj -o root -f eval -a "__import__('config').profiler.dump('/tmp/qtile-hooks.json')"
+profiler: Profiler = globals().get("profiler") or Profiler()
+subscribe = profiler.subscribe(hook.subscribe)
+
+# File writes and sysfs go to a few threads, in order per file or device.
+# Kept across reloads, so jobs queued before a reload still finish.
+executor: Executor = globals().get("executor") or Executor(workers=2)
+subscribe.shutdown(executor.close)
+
+# Set QTILE_RECORD_HOOKS to a file to log the hooks received, which
+# benchmarks/replay.py plays back. It has to subscribe before anything else.
+recorder: HookRecorder | None = globals().get("recorder")
+if recorder is None and (record_path := os.environ.get("QTILE_RECORD_HOOKS")):
+    recorder = HookRecorder(record_path, qtile, executor=executor)  # type: ignore[arg-type]
+if recorder is not None:
+    recorder.subscribe(hook.subscribe)
+    hook.subscribe.shutdown(recorder.close)
+
 MOD = "mod4"
 ALT = "mod1"
 TERMINAL = "foot"
 BROWSER = "firefox"
 LAUNCHER = "fuzzel.sh"
 FILE_MANAGER = "pcmanfm"
-MUSIC_CTRL = """dbus-send --print-reply --dest=org.mpris.MediaPlayer2.spotify
- /org/mpris/MediaPlayer2 org.mpris.MediaPlayer2.Player."""
+
+TITLE_MAX_LENGTH = 50
+BAR_UPDATE_DELAY = 0.016  # Seconds to merge bar updates for, about a frame
+WARM_POOL_SIZE = 2  # Scratchpads kept spawned in the background
+WARM_POOL_MEMORY = 512  # MiB the warm processes may use before the pool stops refilling
+GAME_GROUP = "2"  # Fullscreen windows placed here turn on game mode
+WATCHDOG_THRESHOLD = 0.05  # Seconds anything may hold the event loop before it's logged
 
 font_setting: tuple[str, int] = ("FiraMono Nerd Font", 13)
 
-group_assignments: dict[str, Any[str, ...]] = {
-    "1": (BROWSER),
-    "2": (
-        "valheim.x86_64",
-        "battle.net.exe",
-        "wowclassic.exe",
-        "ck3",
-        "paradox launcher",
-        "steam_app",
-    ),
-    "3": ("discord", "signal"),
-    "4": ("spotify"),
-    "5": ("Steam"),
-}
+# Set QTILE_WATCHDOG to log the handler and stack of anything that holds up
+# input handling. It wakes the event loop twice per threshold, so it's off otherwise.
+watchdog: Watchdog | None = None
+if os.environ.get("QTILE_WATCHDOG"):
+    watchdog = Watchdog(profiler, threshold=WATCHDOG_THRESHOLD)
+    subscribe.startup(watchdog.start)
+    subscribe.shutdown(watchdog.close)
+
+# Colors, group assignments, float rules and scratchpad settings live in
+# settings.toml. Saving it applies what changed, without reloading the config.
+settings = Settings(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.toml")
+)
+subscribe.startup(settings.watch)
+subscribe.shutdown(settings.close)
+
+# Kept as the same dict, so new colors can be filled in where it's used
+colors: dict[str, str] = dict(settings["colors"])
+
+# Compiled once, first matching group wins
+placement = PlacementRules(settings["groups"])
+
+
+@settings.on("groups")
+def apply_group_assignments(assignments: dict[str, list[str]]) -> None:
+    """Compile the new assignments, windows that were placed already stay put"""
+    global placement
+    placement = PlacementRules(assignments)
+
+
+# What an urgent window gets to do, by class. Anything else is flagged in the bar.
+urgency = UrgencyPolicy(
+    {
+        Urgency.FOCUS: (BROWSER,),
+        Urgency.IGNORE: ("steam",),
+    },
+    default=Urgency.FLAG,
+)
 
 # Inputs configuration
 wl_input_rules = {
@@ -73,37 +162,242 @@ wl_input_rules = {
 }
 
 home = os.path.expandvars("$HOME")
-wallpapers = os.listdir(f"{home}/wallpapers")
-random_wallpaper = random.choice(wallpapers)
-path_to_wallpaper = os.path.join(f"{home}/wallpapers", random_wallpaper)
-
-startup_items = [
-    f"waybar -c {home}/.config/waybar/config-qtile.jsonc &",
-    "wlsunset -l 59.6 -L 18.1 &",
-    f"swaybg -m fill -i {path_to_wallpaper} &",
-    f"magick {path_to_wallpaper} -blur 16x8 /tmp/lock_img.jpg &",
-    "mako &",
-    "kanshi &",
-    "swayidle -w timeout 300 'lock.sh' timeout 600 'wlopm --off '*'' resume 'wlopm --on '*'' timeout 900 'sudo zzz' &",
-    "gpg-connect-agent --daemon &",
-    "/usr/libexec/polkit-gnome-authentication-agent-1 &",
-    "dbus-update-activation-environment DISPLAY",
-]
+wallpapers = WallpaperIndex(f"{home}/wallpapers")
+cache_dir = os.environ.get("XDG_CACHE_HOME", f"{home}/.cache")
+runtime_dir = os.environ.get("XDG_RUNTIME_DIR", "/tmp")
+lock_images = LockImages(os.path.join(cache_dir, "qtile", "lock"))
+
+# New terminals are clients of a foot server started with the session
+terminal = TerminalServer(os.path.join(runtime_dir, "foot-qtile.sock"), TERMINAL)
+
+
+def startup_items(wallpaper: str | None) -> list[Service]:
+    """Services started with the session"""
+    items = [
+        terminal.service(),
+        Service("waybar", f"waybar -c {home}/.config/waybar/config-qtile.jsonc"),
+        Service("wlsunset", "wlsunset -l 59.6 -L 18.1"),
+        Service("mako", "mako"),
+        Service("kanshi", "kanshi"),
+        Service(
+            "swayidle",
+            "swayidle -w timeout 300 'lock.sh' timeout 600 'wlopm --off '*'' resume 'wlopm --on '*'' timeout 900 'sudo zzz'",
+        ),
+        Service("gpg-agent", "gpg-connect-agent --daemon", oneshot=True),
+        Service("polkit", "/usr/libexec/polkit-gnome-authentication-agent-1"),
+        Service(
+            "activation environment",
+            "dbus-update-activation-environment DISPLAY",
+            oneshot=True,
+        ),
+    ]
+
+    if wallpaper is not None:
+        items.append(Service("swaybg", f"swaybg -m fill -i {shlex.quote(wallpaper)}"))
+
+    return items
+
 
+# Services keep running across config reloads, so keep supervising them
+supervisor: Supervisor = globals().get("supervisor") or Supervisor()
+subscribe.shutdown(supervisor.stop)
 
-@hook.subscribe.startup_once
+
+backlight = Backlight(ramp_time=0.1, executor=executor)
+
+
+@subscribe.startup_once
 def autostart() -> None:
     """Autostart things when qtile starts"""
 
-    subprocess.call(["brightnessctl set 20%"], shell=True)
+    backlight.set_percent(20)
+
+    wallpaper = wallpapers.random()
+
+    supervisor.start(startup_items(wallpaper))
+
+    if wallpaper is not None:
+        create_task(prepare_lock_images(wallpaper))
+
+
+async def prepare_lock_images(wallpaper: str) -> None:
+    """Get the lock image ready, then blur the other wallpapers in the background"""
+    await lock_images.prepare(wallpaper)
+    await lock_images.warm(wallpapers.images)
+    lock_images.prune(wallpapers.images)
+
+
+# One socket per output carries groups, layout and window title to Waybar
+bars = OutputBars(
+    os.path.join(runtime_dir, "qtile-bar-{output}.sock"),
+    order=("groups", "layout", "title"),
+    delay=BAR_UPDATE_DELAY,
+)
+subscribe.shutdown(bars.close)
+
+
+def output_screens() -> dict[str, Any]:
+    """Screens by the name of the output they are on"""
+    outputs: dict[tuple[int, int], str] = {}
+
+    try:
+        for output in qtile.core.get_enabled_outputs():  # type: ignore[attr-defined]
+            info = output.get_screen_info()
+            outputs[(info.x, info.y)] = output.wlr_output.name
+    except AttributeError:
+        pass
+
+    return {
+        outputs.get((screen.x, screen.y), str(screen.index)): screen
+        for screen in qtile.screens  # type: ignore[attr-defined]
+    }
+
+
+@subscribe.startup
+@subscribe.startup_complete
+@subscribe.screens_reconfigured
+def update_outputs_waybar() -> None:
+    """Give every output its own bar, again after a reload as well"""
+    bars.update(output_screens())
+
 
-    for item in startup_items:
-        with subprocess.Popen(item, shell=True) as process:
-            hook.subscribe.shutdown(process.terminate)
+def is_game(window: Window) -> bool:
+    """Whether a window is one of the games placed in the game group"""
+    wm_class = window.get_wm_class()
+    return wm_class is not None and placement.match(wm_class) == GAME_GROUP
+
+
+# While a game is focused and fullscreen, the helpers get out of its way
+game_mode = GameMode(
+    is_game,
+    supervisor,
+    bars,
+    renice=("swaybg", "waybar", "wlsunset", "mako", "kanshi", "polkit"),
+)
+subscribe.client_killed(game_mode.forget)
+subscribe.shutdown(game_mode.close)
+
+
+@subscribe.focus_change
+@subscribe.float_change
+def update_game_mode() -> None:
+    """Enter or leave game mode as focus and fullscreen change"""
+    game_mode.update(qtile.current_window)  # type: ignore[attr-defined]
+
+
+# Windows per group, kept up to date by the hooks below
+group_cache = GroupCache()
+
+
+@subscribe.group_window_add
+def cache_group_window(group: _Group, window: Window) -> None:
+    """Track a window being added to or moved between groups"""
+    group_cache.add(window, group.name)
+
+
+@subscribe.client_managed
+def cache_window_state(client: Window) -> None:
+    """Floating and fullscreen is only decided after the window is added to a group"""
+    group_cache.update_flags(client)
+
+
+@subscribe.client_killed
+def uncache_window(client: Window) -> None:
+    """Forget about a killed window"""
+    group_cache.remove(client)
+
+
+@subscribe.float_change
+def cache_float_state() -> None:
+    """Refresh floating and fullscreen state of windows in the groups on screen
+
+    The hook doesn't say which window changed, and it may well not be on the
+    current screen, so every group that is shown is refreshed."""
+    for screen in qtile.screens:  # type: ignore[attr-defined]
+        if screen.group is not None:
+            for window in screen.group.windows:
+                group_cache.update_flags(window)
+
+
+# Windows per class for spawn_or_focus
+class_index = ClassIndex()
+
+
+@subscribe.client_managed
+@subscribe.client_name_updated
+def index_window_class(client: Window) -> None:
+    """Index new windows, and windows that might have changed class"""
+    class_index.add(client)
+
+
+@subscribe.client_focus
+def index_window_focus(client: Window) -> None:
+    """Remember which window of a class was focused last"""
+    class_index.add(client)
+    class_index.focus(client)
+
+
+@subscribe.client_killed
+def unindex_window(client: Window) -> None:
+    """Forget about a killed window"""
+    class_index.remove(client)
+
+
+# The track of the active player goes to its own Waybar module
+media_channel = StatusChannel(os.path.join(runtime_dir, "qtile-media.sock"))
+subscribe.shutdown(media_channel.close)
+
+
+@profiler.profile
+def publish_media(track: dict[str, str] | None) -> None:
+    """Send the track of the active player to Waybar, nothing if there is none"""
+    if track is None or not track.get("title"):
+        media_channel.publish({"text": ""})
+        return
+
+    text = " - ".join(filter(None, (track.get("artist"), track["title"])))
+    media_channel.publish(
+        {"text": escape(text), "alt": track["status"], "class": track["status"].lower()}
+    )
+
+
+# One session bus connection for the media keys and the media module
+mpris = MprisController(on_change=publish_media)
+
+
+@subscribe.startup
+async def connect_mpris() -> None:
+    """Connect to the session bus and follow the media players"""
+    await mpris.connect()
+
+
+# One audio server connection for the volume keys
+volume = VolumeController(step=0.05)
+
+
+@subscribe.startup
+async def connect_volume() -> None:
+    """Connect to the audio server and follow the default sink"""
+    await volume.connect()
+
+
+subscribe.shutdown(volume.close)
+
+# Battery, date, wifi and microphone notifications, each replacing its last one
+status_notifications = StatusNotifications(
+    Notifier(), volume, WifiStatus(), executor=executor
+)
+
+
+@subscribe.startup
+async def connect_status_notifications() -> None:
+    """Connect to the notification server and iwd"""
+    await status_notifications.connect()
 
 
 # This is just a temporary workaround to make Waybar align nicely on startup
-@hook.subscribe.client_managed
+@subscribe.client_managed
+@game_mode.nonessential
 def client_managed(_client):
     qtile.core._current_output.organise_layers()  # type: ignore[attr-defined]
 
@@ -112,107 +406,178 @@ class GroupState(Enum):
     EMPTY = 1
     OCCUPIED = 2
     FOCUSED = 3
+    URGENT = 4
 
 
-@hook.subscribe.focus_change
-@hook.subscribe.client_killed
-@hook.subscribe.client_managed
+@subscribe.group_window_add
+@subscribe.client_killed
+@game_mode.nonessential
 def update_groups_waybar(*_args) -> None:
     """Update Waybar of open groups and windows"""
-    existing_groups = dict.fromkeys(qtile.groups_map.keys(), GroupState.EMPTY)  # type: ignore[attr-defined]
+    # The title shows the window count in max layout
+    bars.schedule_all("groups", "title")
 
-    existing_groups.pop("scratchpad", None)
 
-    current_group: str = qtile.current_screen.group.label  # type: ignore[attr-defined]
+@subscribe.setgroup
+@game_mode.nonessential
+def update_screen_groups_waybar() -> None:
+    """Update Waybar when a screen shows another group, maybe taken from another screen"""
+    bars.schedule_all("groups", "layout", "title")
 
-    for window in qtile.windows():  # type: ignore[attr-defined]
-        if (
-            window["wm_class"] is not None
-            and window["group"] is not None
-            and window["group"] in existing_groups
-        ):
-            existing_groups[window["group"]] = GroupState.OCCUPIED
 
-    existing_groups[current_group] = GroupState.FOCUSED
+# Markup templates, filled in with the group name, window title or layout name
+GROUP_MARKUP: dict[GroupState, str] = {}
+TITLE_MARKUP = ""
+LAYOUT_MARKUP = ""
 
-    text: str = ""
 
-    for group, status in existing_groups.items():
-        match status:
-            case GroupState.OCCUPIED:
-                text += f"""<span fgcolor='{colors["primary"]}'> {group} </span>"""
-            case GroupState.EMPTY:
-                text += f"""<span fgcolor='{colors["secondary"]}'> {group} </span>"""
-            case GroupState.FOCUSED:
-                text += f"""<span fgcolor='{colors["background"]}' bgcolor='{colors["primary"]}' line_height='2'> {group} </span>"""
+def fill_markup_templates() -> None:
+    """Make the markup templates from the colors"""
+    global TITLE_MARKUP, LAYOUT_MARKUP
 
-    with open("/tmp/qtile-groups.txt", "w", encoding="utf-8") as output:
-        output.write(text)
-        output.close()
+    GROUP_MARKUP.update(
+        {
+            GroupState.OCCUPIED: f"<span fgcolor='{colors['primary']}'> {{}} </span>",
+            GroupState.EMPTY: f"<span fgcolor='{colors['secondary']}'> {{}} </span>",
+            GroupState.FOCUSED: f"<span fgcolor='{colors['background']}' bgcolor='{colors['primary']}' line_height='2'> {{}} </span>",
+            GroupState.URGENT: f"<span fgcolor='{colors['urgent']}'> {{}} </span>",
+        }
+    )
+    TITLE_MARKUP = f"<span fgcolor='{colors['text']}'>{{}}</span>"
+    LAYOUT_MARKUP = f"<span fgcolor='{colors['primary']}'>{{}}</span>"
+
+
+fill_markup_templates()
+
+
+@bars.renderer("groups")
+def render_groups(screen: Screen) -> str:
+    """Render the markup of open groups and windows"""
+    current_group: str = screen.group.label
+    urgent_groups = urgency.flagged_groups()
+
+    states = tuple(
+        (
+            group,
+            GroupState.FOCUSED
+            if group == current_group
+            else GroupState.URGENT
+            if group in urgent_groups
+            else GroupState.OCCUPIED
+            if group_cache.count(group) > 0
+            else GroupState.EMPTY,
+        )
+        for group in qtile.groups_map  # type: ignore[attr-defined]
+        if group != "scratchpad"
+    )
 
-    subprocess.call(["pkill -RTMIN+8 waybar"], shell=True)
+    return groups_markup(states)
 
 
-@hook.subscribe.client_name_updated
-@hook.subscribe.layout_change
-@hook.subscribe.focus_change
+@lru_cache(maxsize=64)
+def groups_markup(states: tuple[tuple[str, GroupState], ...]) -> str:
+    """The markup of groups in the given states"""
+    return "".join(GROUP_MARKUP[status].format(group) for group, status in states)
+
+
+@subscribe.client_name_updated
+@subscribe.layout_change
+@subscribe.focus_change
+@game_mode.nonessential
 def update_window_title_waybar(*args) -> None:
     """Update Waybar of focused window title"""
+    screen = qtile.current_screen  # type: ignore[attr-defined]
 
-    # Unpack a client from args (ignore layouts and groups)
-    client: Window = args[0] if len(args) == 1 else None
+    match args:
+        # A client changed its title, which only matters if it's focused
+        case (client,):
+            if client.group is None or client is not client.group.current_window:
+                return
+            screen = client.group.screen
 
-    # Ignore any clients that are not the current window
-    if client and client.wid != qtile.current_window.wid:  # type: ignore[attr-defined]
-        return
+        # A layout changed on a group, which may not be on a screen
+        case (_layout, group):
+            screen = group.screen
+
+    if screen is not None:
+        bars.schedule(screen, "title")
+
+
+@bars.renderer("title")
+def render_window_title(screen: Screen) -> str:
+    """Render the markup of the focused window title"""
+    group = screen.group
 
     window_title: str = (
-        "" if qtile.current_window is None else qtile.current_window.name  # type: ignore[attr-defined]
+        "" if group.current_window is None else group.current_window.name
     )
 
     # Count the windows for max layout
-    if qtile.current_layout.name == layout_names["max"]:  # type: ignore[attr-defined]
-        wincount = len(qtile.current_group.windows)  # type: ignore[attr-defined]
+    wincount = 0
+    if group.layout.name == layout_names["max"]:
+        wincount = len(group.windows)
+
+    return title_markup(window_title, wincount)
 
-        window_title = f"({wincount}) {window_title}" if wincount > 1 else window_title
 
-    with open("/tmp/qtile-window-title.txt", "w", encoding="utf-8") as output:
-        output.write(f"<span fgcolor='{colors["text"]}'>{window_title}</span>")
-        output.close()
+@lru_cache(maxsize=32)
+def title_markup(window_title: str, wincount: int) -> str:
+    """The markup of a window title, with the window count when above one"""
+    window_title = f"({wincount}) {window_title}" if wincount > 1 else window_title
 
-    subprocess.call(["pkill -RTMIN+9 waybar"], shell=True)
+    if len(window_title) > TITLE_MAX_LENGTH:
+        window_title = f"{window_title[: TITLE_MAX_LENGTH - 1]}…"
 
+    return TITLE_MARKUP.format(escape(window_title))
 
-@hook.subscribe.startup_complete
-@hook.subscribe.layout_change
-def update_layout_waybar(*_args) -> None:
+
+@subscribe.layout_change
+@game_mode.nonessential
+def update_layout_waybar(_layout, group: _Group) -> None:
     """Update Waybar of current layout"""
+    if group.screen is not None:
+        bars.schedule(group.screen, "layout")
+
 
-    current_layout = qtile.current_layout.name or ""  # type: ignore[attr-defined]
+@bars.renderer("layout")
+def render_layout(screen: Screen) -> str:
+    """Render the markup of the current layout"""
 
-    with open("/tmp/qtile-layout.txt", "w", encoding="utf-8") as output:
-        output.write(f"<span fgcolor='{colors["primary"]}'>{current_layout}</span>")
-        output.close()
+    return layout_markup(screen.group.layout.name or "")
 
-    subprocess.call(["pkill -RTMIN+7 waybar"], shell=True)
 
+@lru_cache(maxsize=8)
+def layout_markup(current_layout: str) -> str:
+    """The markup of a layout name"""
+    return LAYOUT_MARKUP.format(current_layout)
 
-@hook.subscribe.client_urgent_hint_changed
+
+@subscribe.client_urgent_hint_changed
 def follow_url(client: Window) -> None:
-    """If Firefox is flagged as urgent, focus it"""
+    """If Firefox is flagged as urgent, focus it, and flag other urgent windows"""
+
+    match urgency.decide(client):
+        case Urgency.FOCUS if client.group is not None:
+            qtile.current_screen.set_group(client.group)  # type: ignore[attr-defined]
+            client.group.focus(client)
+        case Urgency.FLAG:
+            bars.schedule_all("groups")
+
+
+@subscribe.client_focus
+def unflag_window(client: Window) -> None:
+    """An urgent window has been seen once it's focused"""
+    if urgency.unflag(client):
+        bars.schedule_all("groups")
 
-    wm_class: list | None = client.get_wm_class()
 
-    if wm_class is not None:
-        for item in wm_class:
-            match item:
-                case item if item.lower() in BROWSER and client.group is not None:
-                    qtile.current_screen.set_group(client.group)  # type: ignore[attr-defined]
-                    client.group.focus(client)
-                    return
+@subscribe.client_killed
+def forget_urgency(client: Window) -> None:
+    """Forget the urgency of a killed window"""
+    urgency.forget(client)
 
 
-@hook.subscribe.float_change
+@subscribe.float_change
 def center_window() -> None:
     """Centers all the floating windows"""
 
@@ -223,24 +588,32 @@ def center_window() -> None:
         return
 
 
-@hook.subscribe.client_new
+@subscribe.client_new
 def assign_app_group(client: Window) -> None:
     """Decides which apps go where when they are launched"""
     wm_class: list | None = client.get_wm_class()
     if wm_class is None:
         return
 
+    group = placement.match(wm_class)
+    if group is None:
+        return
+
     try:
-        for group, apps in group_assignments.items():
-            if any(item.lower().startswith(apps) for item in wm_class):
-                client.togroup(group)
+        client.togroup(group)
     except IndexError:
         return
 
 
-@hook.subscribe.client_new
+@subscribe.client_new
 def toggle_fullscreen_off(client: Window) -> None:
-    """Toggle fullscreen off in case there's any window fullscreened in the group"""
+    """Toggle fullscreen off in case there's any window fullscreened in the group
+
+    Dropdowns spawned by the warm pool are hidden right away, so they leave
+    a fullscreen window alone."""
+
+    if warm_pool.warming(client):
+        return
 
     try:
         group = client.group
@@ -250,12 +623,12 @@ def toggle_fullscreen_off(client: Window) -> None:
     if group is None:
         group = qtile.current_group  # type: ignore[attr-defined]
 
-    for window in group.windows:
-        if window.fullscreen:
-            window.toggle_fullscreen()
+    for window in group_cache.fullscreen_windows(group.name):
+        window.toggle_fullscreen()
+        group_cache.update_flags(window)
 
 
-@hook.subscribe.client_killed
+@subscribe.client_killed
 def fallback_default_layout(client: Window) -> None:
     """Reset a group to default layout when theres is only one window left"""
 
@@ -267,12 +640,7 @@ def fallback_default_layout(client: Window) -> None:
     ):
         return
 
-    try:
-        win_count = len(client.group.windows)
-    except AttributeError:
-        win_count = 0
-
-    if win_count > 1:
+    if group_cache.count(client.group.name) > 1:
         return
 
     group_name: str = client.group.name
@@ -281,34 +649,30 @@ def fallback_default_layout(client: Window) -> None:
     qtile.to_layout_index(default_layout_index, group_name)  # type: ignore[attr-defined]
 
 
-@hook.subscribe.current_screen_change
+@subscribe.current_screen_change
+@game_mode.nonessential
 def warp_cursor() -> None:
     """Warp cursor to focused screen"""
     qtile.warp_to_screen()  # type: ignore[attr-defined]
 
 
+@profiler.profile
 def spawn_or_focus(self: Qtile, app: str) -> None:
     """Check if the app being launched is already running, if so focus it"""
-    window = None
-    for win in self.windows_map.values():
-        if isinstance(win, Window):
-            wm_class: list | None = win.get_wm_class()
-            if wm_class is None or win.group is None:
-                return
-            if any(item.lower() in app.lower() for item in wm_class):
-                window = win
-                group = win.group
-                group.toscreen(toggle=False)
-                break
+    window = class_index.find(app)
+
+    if window is not None:
+        assert window.group is not None, "Only windows in a group are indexed"
+        window.group.toscreen(toggle=False)
 
     if window is None:
         self.spawn(app)
 
     elif window == self.current_window:
         try:
-            assert (
-                self.current_layout.swap_main is not None
-            ), "The current layout should have swap_main"
+            assert self.current_layout.swap_main is not None, (
+                "The current layout should have swap_main"
+            )
             self.current_layout.swap_main()
         except AttributeError:
             return
@@ -316,18 +680,67 @@ def spawn_or_focus(self: Qtile, app: str) -> None:
         self.current_group.focus(window)
 
 
+@profiler.profile
+def open_terminal(self: Qtile) -> None:
+    """Open a terminal, as a client of the terminal server when it's up"""
+    self.spawn(terminal.command())
+
+
+@profiler.profile
+def launch(self: Qtile, command: str) -> None:
+    """Start a program, timed by the profiler"""
+    self.spawn(command)
+
+
+@profiler.profile
+def toggle_dropdown(_self: Qtile, name: str) -> None:
+    """Toggle a scratchpad dropdown, even while the warm pool is spawning it"""
+    warm_pool.toggle(name)
+
+
+@profiler.profile
+def media_control(_self: Qtile, method: str) -> None:
+    """Send a command to the active media player"""
+    mpris.call(method)
+
+
+@profiler.profile
+def show_status(_self: Qtile, topic: str) -> None:
+    """Post the status of battery, date, wifi or microphone as a notification"""
+    status_notifications.show(topic)
+
+
+@profiler.profile
+def change_volume(_self: Qtile, steps: int) -> None:
+    """Raise or lower the volume of the default sink"""
+    volume.change(steps)
+
+
+@profiler.profile
+def toggle_mute(_self: Qtile) -> None:
+    """Mute or unmute the default sink"""
+    volume.toggle_mute()
+
+
+@profiler.profile
+def change_brightness(_self: Qtile, percent: int) -> None:
+    """Raise or lower the screen brightness"""
+    backlight.change(percent)
+
+
+@profiler.profile
 def float_to_front(self: Qtile) -> None:
     """Bring all floating windows of the group to front"""
-    for window in self.current_group.windows:
-        if window.floating:
-            window.bring_to_front()
+    for window in group_cache.floating_windows(self.current_group.name):
+        window.bring_to_front()
 
 
+@profiler.profile
 def toggle_layout(self: Qtile, layout_name: str) -> None:
     """Takes a layout name and tries to set it, or if it's already active back to monadtall"""
-    assert (
-        self.current_group.screen is not None
-    ), "The screen should not be none for the current group"
+    assert self.current_group.screen is not None, (
+        "The screen should not be none for the current group"
+    )
     screen_rect = self.current_group.screen.get_rect()
     self.current_group.layout.hide()
     if self.current_group.layout.name == layout_name:
@@ -337,12 +750,14 @@ def toggle_layout(self: Qtile, layout_name: str) -> None:
     self.current_group.layout.show(screen_rect)
 
 
+@profiler.profile
 def next_window(self: Qtile) -> None:
     """If treetab or max layout, cycle next window"""
     if self.current_layout.name in (layout_names["max"], layout_names["treetab"]):
         self.current_group.layout.down()
 
 
+@profiler.profile
 def focus_group(self: Qtile, direction: str) -> None:
     """Go to next/previous group"""
     group: _Group = self.current_screen.group
@@ -360,6 +775,7 @@ def focus_group(self: Qtile, direction: str) -> None:
     self.current_screen.set_group(go_to)
 
 
+@profiler.profile
 def window_to_screen(self: Qtile, direction: str) -> None:
     """Send a window to next/previous screen"""
     screen_i: int = self.screens.index(self.current_screen)
@@ -377,11 +793,26 @@ def window_to_screen(self: Qtile, direction: str) -> None:
 
 
 # Layouts
-layout_theme: dict[str, int | str] = {
-    "border_width": 3,
-    "border_focus": colors["primary"],
-    "border_normal": colors["secondary"],
-}
+def border_colors() -> dict[str, str]:
+    """Window borders of the tiling and floating layouts"""
+    return {"border_focus": colors["primary"], "border_normal": colors["secondary"]}
+
+
+def tab_colors() -> dict[str, str]:
+    """Tabs and sections of the tree tab panel"""
+    return {
+        "active_fg": colors["background"],
+        "active_bg": colors["primary"],
+        "bg_color": colors["background"],
+        "inactive_bg": colors["secondary"],
+        "inactive_fg": colors["text"],
+        "urgent_fg": colors["urgent"],
+        "urgent_bg": colors["secondary"],
+        "section_fg": colors["background"],
+    }
+
+
+layout_theme: dict[str, int | str] = {"border_width": 3, **border_colors()}
 
 layout_names: dict[str, str] = {"monadtall": "tall~", "max": "max~", "treetab": "tree~"}
 
@@ -395,39 +826,72 @@ layouts = [
         name=layout_names["monadtall"],
     ),
     Max(name=layout_names["max"]),
-    TreeTab(
+    CachedTreeTab(
         name=layout_names["treetab"],
         font=font_setting[0],
         fontsize=font_setting[1],
-        active_fg=colors["background"],
-        active_bg=colors["primary"],
-        bg_color=colors["background"],
+        **tab_colors(),
         border_width=5,
-        inactive_bg=colors["secondary"],
-        inactive_fg=colors["text"],
         previous_on_rm=True,
-        urgent_fg=colors["urgent"],
-        urgent_bg=colors["secondary"],
         sections=[""],
-        section_fg=colors["background"],
         padding_left=10,
         padding_y=8,
         margin_y=0,
     ),
 ]
 
+
+def float_rules(rules: list[dict[str, Any]]) -> list[_Match]:
+    """qtile's default float rules followed by the ones in the settings"""
+    return [*Floating.default_float_rules, *(Match(**rule) for rule in rules)]
+
+
 floating_layout = Floating(
-    float_rules=[
-        *Floating.default_float_rules,
-        Match(wm_class="Pinentry-gtk-2"),
-        Match(wm_class="pavucontrol"),
-        Match(title="Execute File", wm_class="Pcmanfm"),
-        Match(title="Confirm File Replacing", wm_class="Pcmanfm"),
-        Match(title="Steam", wm_class=""),
-    ],
-    **layout_theme,
+    float_rules=float_rules(settings["float_rules"]), **layout_theme
 )
 
+# The colors each themed layout is drawn in
+layout_colors: dict[type, Callable[[], dict[str, str]]] = {
+    MonadTall: border_colors,
+    CachedTreeTab: tab_colors,
+    Floating: border_colors,
+}
+
+
+@settings.on("colors")
+def apply_colors(new_colors: dict[str, str]) -> None:
+    """Redraw the bars and layouts in the new colors"""
+    colors.update(new_colors)
+
+    fill_markup_templates()
+    for markup in (groups_markup, title_markup, layout_markup):
+        markup.cache_clear()
+    bars.schedule_all("groups", "layout", "title")
+
+    # Every group has its own copies of the layouts above, which new groups copy
+    themed = [*layouts, floating_layout]
+    for group in qtile.groups:  # type: ignore[attr-defined]
+        themed.extend((*group.layouts, group.floating_layout))
+
+    for layout in themed:
+        theme = layout_colors.get(type(layout))
+        if theme is not None:
+            for attr, value in theme().items():
+                setattr(layout, attr, value)
+
+    for group in qtile.groups:  # type: ignore[attr-defined]
+        if group.screen is not None:
+            group.layout_all()
+            if isinstance(group.layout, CachedTreeTab):
+                group.layout.draw_panel()
+
+
+@settings.on("float_rules")
+def apply_float_rules(rules: list[dict[str, Any]]) -> None:
+    """Swap the float rules in the list every group's floating layout shares"""
+    floating_layout.float_rules[:] = float_rules(rules)
+
+
 # Keybinds
 keys = [
     # Switch focus between windows
@@ -496,47 +960,45 @@ keys = [
     Key([MOD], "m", lazy.function(toggle_layout, layout_names["max"])),
     Key([MOD], "t", lazy.function(toggle_layout, layout_names["treetab"])),
     # Notification commands
-    Key([MOD, "shift"], "b", lazy.spawn("callbacks.sh battery")),
-    Key([MOD, "shift"], "d", lazy.spawn("callbacks.sh date")),
-    Key([MOD, "shift"], "w", lazy.spawn("callbacks.sh wifi")),
+    Key([MOD, "shift"], "b", lazy.function(show_status, "battery")),
+    Key([MOD, "shift"], "d", lazy.function(show_status, "date")),
+    Key([MOD, "shift"], "w", lazy.function(show_status, "wifi")),
     # Some app shortcuts
     Key([MOD], "w", lazy.function(spawn_or_focus, BROWSER)),
-    Key([MOD], "Return", lazy.spawn(TERMINAL)),
-    Key([MOD, "control"], "Return", lazy.spawn(FILE_MANAGER)),
+    Key([MOD], "Return", lazy.function(open_terminal)),
+    Key([MOD, "control"], "Return", lazy.function(launch, FILE_MANAGER)),
     Key([MOD], "c", lazy.function(spawn_or_focus, "signal-desktop")),
-    Key([MOD], "r", lazy.spawn(LAUNCHER)),
+    Key([MOD], "r", lazy.function(launch, LAUNCHER)),
     Key(
         [MOD], "d", lazy.function(spawn_or_focus, "flatpak run com.discordapp.Discord")
     ),
     Key([MOD], "s", lazy.function(spawn_or_focus, "flatpak run com.spotify.Client")),
     Key([MOD], "g", lazy.function(spawn_or_focus, "steam-native")),
-    Key([MOD], "p", lazy.spawn("pass.sh")),
-    Key([MOD], "o", lazy.spawn("otp.sh")),
-    Key([MOD, "control"], "m", lazy.spawn("mount.sh")),
-    Key([MOD], "e", lazy.spawn("emojis.sh")),
-    Key([MOD, "shift"], "p", lazy.spawn("screenshot.sh")),
+    Key([MOD], "p", lazy.function(launch, "pass.sh")),
+    Key([MOD], "o", lazy.function(launch, "otp.sh")),
+    Key([MOD, "control"], "m", lazy.function(launch, "mount.sh")),
+    Key([MOD], "e", lazy.function(launch, "emojis.sh")),
+    Key([MOD, "shift"], "p", lazy.function(launch, "screenshot.sh")),
     # ScratchPads
-    Key([MOD, "shift"], "Return", lazy.group["scratchpad"].dropdown_toggle("terminal")),
-    Key([MOD], "n", lazy.group["scratchpad"].dropdown_toggle("newsboat")),
+    Key([MOD, "shift"], "Return", lazy.function(toggle_dropdown, "terminal")),
+    Key([MOD], "n", lazy.function(toggle_dropdown, "newsboat")),
     Key([MOD], "Escape", lazy.group["scratchpad"].hide_all()),
     # Spotify controls, lacking real media keys on 65% keyboard
-    Key([MOD], "8", lazy.spawn(f"{MUSIC_CTRL}PlayPause")),
-    Key([MOD], "9", lazy.spawn(f"{MUSIC_CTRL}Next")),
-    Key([MOD], "7", lazy.spawn(f"{MUSIC_CTRL}Previous")),
+    Key([MOD], "8", lazy.function(media_control, "PlayPause")),
+    Key([MOD], "9", lazy.function(media_control, "Next")),
+    Key([MOD], "7", lazy.function(media_control, "Previous")),
     # Media volume keys
-    Key([], "XF86AudioMute", lazy.spawn("pactl set-sink-mute 0 toggle")),
-    Key(
-        [MOD, "shift"], "m", lazy.spawn("pactl set-sink-mute 0 toggle")
-    ),  # Extra keybind
-    Key([], "XF86AudioLowerVolume", lazy.spawn("pactl set-sink-volume 0 -5%")),
-    Key([], "XF86AudioRaiseVolume", lazy.spawn("pactl set-sink-volume 0 +5%")),
+    Key([], "XF86AudioMute", lazy.function(toggle_mute)),
+    Key([MOD, "shift"], "m", lazy.function(toggle_mute)),  # Extra keybind
+    Key([], "XF86AudioLowerVolume", lazy.function(change_volume, -1)),
+    Key([], "XF86AudioRaiseVolume", lazy.function(change_volume, 1)),
     # Brightness controll
-    Key([], "XF86MonBrightnessDown", lazy.spawn("brightnessctl set 5%-")),
-    Key([], "XF86MonBrightnessUp", lazy.spawn("brightnessctl set +5%")),
+    Key([], "XF86MonBrightnessDown", lazy.function(change_brightness, -5)),
+    Key([], "XF86MonBrightnessUp", lazy.function(change_brightness, 5)),
     # Microphone toggle muted/unmuted
-    Key([MOD], "q", lazy.spawn("callbacks.sh mic")),
+    Key([MOD], "q", lazy.function(show_status, "mic")),
     # System controls
-    Key([MOD], "l", lazy.spawn("lock.sh")),
+    Key([MOD], "l", lazy.function(launch, "lock.sh")),
     Key([MOD, "shift"], "r", lazy.reload_config()),
     Key([MOD, "control"], "r", lazy.restart()),
     Key([MOD, "shift"], "q", lazy.shutdown()),
@@ -564,28 +1026,66 @@ for i in groups:
 
 # ScratchPads
 
-scratchpad_conf: dict[str, Any] = {
-    "warp_pointer": False,
-    "height": 0.6,
-    "y": 0.2,
-    "opacity": 1,
-}
+scratchpad_conf: dict[str, Any] = settings["scratchpad"]
 
+# Dropdowns are clients of the terminal server too, so they are found by app id
 groups.append(
     ScratchPad(
         "scratchpad",
         [
-            DropDown("terminal", TERMINAL, **scratchpad_conf),
+            DropDown(
+                "terminal",
+                terminal.fallback_command(app_id="dropdown-terminal"),
+                match=Match(wm_class="dropdown-terminal"),
+                **scratchpad_conf,
+            ),
             DropDown(
                 "newsboat",
-                f"""{TERMINAL} newsboat -C=~/.config/newsboat/config
-                -u=~/sync/files/newsboat/urls -c=~/sync/files/newsboat/cache.db""",
+                terminal.fallback_command(
+                    "newsboat",
+                    "-C=~/.config/newsboat/config",
+                    "-u=~/sync/files/newsboat/urls",
+                    "-c=~/sync/files/newsboat/cache.db",
+                    app_id="dropdown-newsboat",
+                ),
+                match=Match(wm_class="dropdown-newsboat"),
                 **scratchpad_conf,
             ),
         ],
     )
 )
 
+
+@settings.on("scratchpad")
+def apply_scratchpad(conf: dict[str, Any]) -> None:
+    """Change the dropdowns for their next spawn, and the ones already spawned"""
+    scratchpad = qtile.groups_map.get("scratchpad")  # type: ignore[attr-defined]
+    if scratchpad is None:
+        return
+
+    for name in scratchpad._dropdownconfig:
+        scratchpad.dropdown_reconfigure(name, **conf)
+
+    for dropdown in scratchpad.dropdowns.values():
+        for attr, value in conf.items():
+            if attr == "opacity":
+                dropdown.window.opacity = value
+            elif hasattr(dropdown, attr):
+                setattr(dropdown, attr, value)
+
+
+# Spawn the dropdowns hidden once the session is up, and again after they are closed
+warm_pool = WarmPool(
+    qtile,  # type: ignore[arg-type]
+    ("terminal", "newsboat"),
+    size=WARM_POOL_SIZE,
+    memory_limit=WARM_POOL_MEMORY,
+    shared=partial(supervisor.pid, terminal.name),
+)
+subscribe.startup_complete(warm_pool.schedule)
+subscribe.client_killed(warm_pool.refill)
+subscribe.shutdown(warm_pool.close)
+
 # Mouse
 mouse = [
     Drag(
@@ -0,0 +1,185 @@
+"""
+Getting the desktop out of the way of fullscreen games
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import resource
+import time
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+    from libqtile.backend.base import Window
+
+    from statusbar import OutputBars
+    from supervisor import Supervisor
+
+
+class GameMode:
+    """Throttles background work while a game is focused and fullscreen
+
+    Services in `renice` get `niceness`. They are never stopped, since a
+    stopped Wayland client stops answering the compositor, which then
+    disconnects it. Bars are paused and handlers marked `nonessential` are
+    skipped. Leaving restores everything and logs how much work was skipped.
+
+    Lowering the niceness back needs RLIMIT_NICE or CAP_SYS_NICE, so a
+    thread is only reniced when RLIMIT_NICE allows its niceness to be
+    restored. With the default limit of 0 nothing is reniced at all."""
+
+    def __init__(
+        self,
+        is_game: Callable[[Window], bool],
+        supervisor: Supervisor,
+        bars: OutputBars,
+        renice: tuple[str, ...] = (),
+        niceness: int = 10,
+    ) -> None:
+        self.is_game = is_game
+        self.supervisor = supervisor
+        self.bars = bars
+        self.renice = renice
+        self.niceness = niceness
+        self.game: Window | None = None
+        self.since = 0.0
+        self.niced: dict[int, int] = {}
+        self._bar_skipped = 0
+        self.stats: dict[str, int | float] = {
+            "entered": 0,
+            "seconds": 0.0,
+            "skipped_hooks": 0,
+            "skipped_bar_updates": 0,
+        }
+
+    @property
+    def active(self) -> bool:
+        return self.game is not None
+
+    def nonessential(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Skip a hook handler while a game is played"""
+
+        @functools.wraps(func)
+        def handler(*args: Any, **kwargs: Any) -> Any:
+            if self.game is not None:
+                self.stats["skipped_hooks"] += 1
+                return None
+            return func(*args, **kwargs)
+
+        return handler
+
+    def update(self, window: Window | None) -> None:
+        """Follow the focused window, entering or leaving as needed"""
+        try:
+            playing = window is not None and window.fullscreen and self.is_game(window)
+        except AttributeError:
+            playing = False
+
+        if playing and self.game is None:
+            self.enter(window)  # type: ignore[arg-type]
+        elif not playing and self.game is not None:
+            self.exit()
+        elif playing:
+            self.game = window
+
+    def forget(self, window: Window) -> None:
+        """Leave when the game itself is killed"""
+        if window is self.game:
+            self.exit()
+
+    def _pids(self, names: tuple[str, ...]) -> list[int]:
+        pids = []
+        for name in names:
+            service = self.supervisor.services.get(name)
+            process = None if service is None else service.process
+            if process is not None and process.returncode is None:
+                pids.append(process.pid)
+        return pids
+
+    @staticmethod
+    def _restorable(niceness: int) -> bool:
+        """Whether the niceness could be set again after raising it"""
+        if os.geteuid() == 0:
+            return True
+        limit, _hard = resource.getrlimit(resource.RLIMIT_NICE)
+        return limit == resource.RLIM_INFINITY or niceness >= 20 - limit
+
+    @staticmethod
+    def _threads(pid: int) -> list[int]:
+        """Niceness is per thread on Linux, so every thread is reniced"""
+        try:
+            return [int(task) for task in os.listdir(f"/proc/{pid}/task")]
+        except OSError:
+            return [pid]
+
+    def enter(self, window: Window) -> None:
+        """Renice the helpers and stop updating the bars"""
+        self.game = window
+        self.since = time.monotonic()
+        self.stats["entered"] += 1
+        self.bars.pause()
+        self._bar_skipped = self.bars.skipped
+
+        kept = 0
+        for pid in self._pids(self.renice):
+            for thread in self._threads(pid):
+                try:
+                    priority = os.getpriority(os.PRIO_PROCESS, thread)
+                    if priority >= self.niceness:
+                        continue
+                    if not self._restorable(priority):
+                        kept += 1
+                        continue
+                    os.setpriority(os.PRIO_PROCESS, thread, self.niceness)
+                    self.niced[thread] = priority
+                except OSError:
+                    pass
+
+        if kept:
+            logger.info(
+                "Not renicing %d threads, RLIMIT_NICE would not let them back", kept
+            )
+
+        logger.info("Game mode on for %s", window.name)
+
+    def exit(self) -> None:
+        """Restore everything that was throttled"""
+        if self.game is None:
+            return
+
+        self.game = None
+        self.bars.resume()
+
+        denied = 0
+        for thread, priority in self.niced.items():
+            try:
+                os.setpriority(os.PRIO_PROCESS, thread, priority)
+            except PermissionError:
+                denied += 1
+            except ProcessLookupError:
+                pass
+        self.niced.clear()
+
+        if denied:
+            logger.warning("Not allowed to restore the priority of %d threads", denied)
+
+        seconds = time.monotonic() - self.since
+        self.stats["seconds"] += seconds
+        self.stats["skipped_bar_updates"] += self.bars.skipped - self._bar_skipped
+
+        logger.info(
+            "Game mode off after %.0fs, skipped %d hooks and %d bar updates so far",
+            seconds,
+            self.stats["skipped_hooks"],
+            self.stats["skipped_bar_updates"],
+        )
+
+    def close(self) -> None:
+        """Never leave helpers reniced behind a reload or shutdown"""
+        self.exit()
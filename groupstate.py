@@ -0,0 +1,120 @@
+"""
+Keeping track of windows per group
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+
+if TYPE_CHECKING:
+    from libqtile.backend.base import Window
+    from libqtile.core.manager import Qtile
+
+
+class GroupCache:
+    """Per group model of windows, updated from hooks instead of scanning
+
+    All windows are keyed on their wid, which also makes it safe to look up
+    windows that have been killed in the meantime."""
+
+    def __init__(self) -> None:
+        self.clients: dict[int, Window] = {}
+        self.locations: dict[int, str] = {}
+        self.windows: defaultdict[str, set[int]] = defaultdict(set)
+        self.floating: defaultdict[str, set[int]] = defaultdict(set)
+        self.fullscreen: defaultdict[str, set[int]] = defaultdict(set)
+
+    def add(self, window: Window, group: str) -> None:
+        """Place a window in a group, moving it if it was somewhere else"""
+        self.remove(window)
+        self.clients[window.wid] = window
+        self.locations[window.wid] = group
+        self.windows[group].add(window.wid)
+        self.update_flags(window)
+
+    def remove(self, window: Window) -> None:
+        """Forget about a window"""
+        group = self.locations.pop(window.wid, None)
+        self.clients.pop(window.wid, None)
+
+        if group is None:
+            return
+
+        self.windows[group].discard(window.wid)
+        self.floating[group].discard(window.wid)
+        self.fullscreen[group].discard(window.wid)
+
+    def update_flags(self, window: Window) -> None:
+        """Refresh the floating and fullscreen state of a window"""
+        group = self.locations.get(window.wid)
+
+        if group is None:
+            return
+
+        for flagged, state in (
+            (self.floating[group], window.floating),
+            (self.fullscreen[group], window.fullscreen),
+        ):
+            if state:
+                flagged.add(window.wid)
+            else:
+                flagged.discard(window.wid)
+
+    def count(self, group: str) -> int:
+        """Number of windows in a group"""
+        return len(self.windows[group])
+
+    def floating_windows(self, group: str) -> list[Window]:
+        """Floating windows in a group, including fullscreen ones"""
+        return [self.clients[wid] for wid in self.floating[group]]
+
+    def fullscreen_windows(self, group: str) -> list[Window]:
+        """Fullscreen windows in a group"""
+        return [self.clients[wid] for wid in self.fullscreen[group]]
+
+    def rebuild(self, qtile: Qtile) -> None:
+        """Throw away the cache and build it again from a full scan"""
+        for mapping in (
+            self.clients,
+            self.locations,
+            self.windows,
+            self.floating,
+            self.fullscreen,
+        ):
+            mapping.clear()
+
+        for group in qtile.groups:
+            for window in group.windows:
+                self.add(window, group.name)
+
+    def verify(self, qtile: Qtile) -> list[str]:
+        """Compare the cache against a full scan and log any differences
+
+        Can be run from the command line:
+        qtile cmd-obj -o root -f eval -a "__import__('config').group_cache.verify(self)"
+        """
+        problems: list[str] = []
+
+        for group in qtile.groups:
+            scanned = {
+                "windows": {window.wid for window in group.windows},
+                "floating": {window.wid for window in group.windows if window.floating},
+                "fullscreen": {
+                    window.wid for window in group.windows if window.fullscreen
+                },
+            }
+
+            for kind, wids in scanned.items():
+                cached = getattr(self, kind)[group.name]
+                if cached != wids:
+                    problems.append(
+                        f"{group.name} {kind}: cached {sorted(cached)}, scanned {sorted(wids)}"
+                    )
+
+        for problem in problems:
+            logger.warning("Group cache out of sync, %s", problem)
+
+        return problems
@@ -0,0 +1,34 @@
+"""
+A TreeTab that doesn't rebuild its tab panel when nothing moved
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from libqtile.layout.tree import TreeTab
+
+if TYPE_CHECKING:
+    from libqtile.config import ScreenRect
+
+
+class CachedTreeTab(TreeTab):
+    """TreeTab that keeps its tab panel when it would come out the same
+
+    Laying out and showing both resize the panel, which recreates its text
+    layout and redraws it. The panel redraws itself when titles or focus
+    change, so resizing it to the same place is skipped."""
+
+    _panel_rect: tuple[int, int, int, int] | None = None
+
+    def _resize_panel(self, screen_rect: ScreenRect) -> None:
+        rect = (screen_rect.x, screen_rect.y, screen_rect.width, screen_rect.height)
+        if self._panel and rect == self._panel_rect:
+            return
+
+        super()._resize_panel(screen_rect)
+        self._panel_rect = rect if self._panel else None
+
+    def finalize(self) -> None:
+        self._panel_rect = None
+        super().finalize()
@@ -0,0 +1,227 @@
+"""
+Controlling and following media players over MPRIS
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+from libqtile.utils import create_task, dbus_bus_connections
+
+try:
+    from dbus_next import DBusError, Message
+    from dbus_next.aio import MessageBus
+    from dbus_next.constants import BusType, MessageFlag, MessageType
+    from dbus_next.errors import AuthError, InvalidAddressError
+
+    has_dbus = True
+except ImportError:
+    has_dbus = False
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+MPRIS_PREFIX = "org.mpris.MediaPlayer2."
+MPRIS_PATH = "/org/mpris/MediaPlayer2"
+PLAYER_INTERFACE = "org.mpris.MediaPlayer2.Player"
+PROPERTIES_INTERFACE = "org.freedesktop.DBus.Properties"
+DBUS_NAME = "org.freedesktop.DBus"
+DBUS_PATH = "/org/freedesktop/DBus"
+
+
+class MprisController:
+    """Keeps one session bus connection to send player commands and follow players
+
+    Players are found through NameOwnerChanged, and their playback status
+    and track through PropertiesChanged, so nothing is ever polled. The
+    player being controlled is the one that is playing, or else the one
+    that showed up most recently. `on_change` is called with the track of
+    that player whenever it, its status or the player itself changes."""
+
+    def __init__(
+        self, on_change: Callable[[dict[str, str] | None], None] | None = None
+    ) -> None:
+        self.on_change = on_change
+        self.bus: MessageBus | None = None
+        self.players: list[str] = []
+        self.owners: dict[str, str] = {}
+        self.states: dict[str, dict[str, str]] = {}
+        self.track: dict[str, str] | None = None
+
+    async def connect(self) -> None:
+        """Connect to the session bus and start following players"""
+        if not has_dbus:
+            logger.warning("dbus-next is not installed. Media keys will not work.")
+            return
+
+        try:
+            bus = await MessageBus(bus_type=BusType.SESSION).connect()
+        except (OSError, AuthError, DBusError, InvalidAddressError):
+            logger.warning("Unable to connect to dbus for media keys.")
+            return
+
+        # Let qtile close the connection on reload and shutdown
+        dbus_bus_connections.add(bus)
+
+        bus.add_message_handler(self._on_message)
+        self.bus = bus
+
+        for rule in (
+            (
+                "type='signal',interface='org.freedesktop.DBus',"
+                "member='NameOwnerChanged',arg0namespace='org.mpris.MediaPlayer2'"
+            ),
+            (
+                f"type='signal',interface='{PROPERTIES_INTERFACE}',"
+                f"member='PropertiesChanged',path='{MPRIS_PATH}',arg0='{PLAYER_INTERFACE}'"
+            ),
+        ):
+            await self._call(DBUS_NAME, DBUS_PATH, DBUS_NAME, "AddMatch", "s", rule)
+
+        reply = await self._call(DBUS_NAME, DBUS_PATH, DBUS_NAME, "ListNames")
+
+        if reply is not None:
+            self.players = [name for name in reply[0] if name.startswith(MPRIS_PREFIX)]
+
+        await asyncio.gather(*(self._follow(name) for name in self.players))
+
+        if not self.players:
+            # Still tell, so the media module knows there is nothing playing
+            self._changed(force=True)
+
+    async def _call(
+        self,
+        destination: str,
+        path: str,
+        interface: str,
+        member: str,
+        signature: str = "",
+        *body: Any,
+    ) -> list | None:
+        assert self.bus is not None, "The bus should be connected"
+        reply = await self.bus.call(
+            Message(
+                destination=destination,
+                path=path,
+                interface=interface,
+                member=member,
+                signature=signature,
+                body=list(body),
+            )
+        )
+        if reply is None or reply.message_type == MessageType.ERROR:
+            return None
+        return reply.body
+
+    async def _follow(self, name: str, owner: str | None = None) -> None:
+        """Learn who owns a player and what it is playing right now"""
+        if owner is None:
+            reply = await self._call(
+                DBUS_NAME, DBUS_PATH, DBUS_NAME, "GetNameOwner", "s", name
+            )
+            if reply is None:
+                return
+            owner = reply[0]
+
+        self.owners[owner] = name
+
+        reply = await self._call(
+            name, MPRIS_PATH, PROPERTIES_INTERFACE, "GetAll", "s", PLAYER_INTERFACE
+        )
+        if name not in self.players:
+            return
+
+        if reply is not None:
+            self._update(name, reply[0])
+
+        self._changed()
+
+    def _on_message(self, message: Message) -> None:
+        if message.message_type != MessageType.SIGNAL or not message.body:
+            return
+
+        if message.member == "NameOwnerChanged" and message.interface == DBUS_NAME:
+            self._on_owner_changed(*message.body)
+
+        elif (
+            message.member == "PropertiesChanged"
+            and message.interface == PROPERTIES_INTERFACE
+            and message.body[0] == PLAYER_INTERFACE
+            and message.sender in self.owners
+        ):
+            self._update(self.owners[message.sender], message.body[1])
+            self._changed()
+
+    def _on_owner_changed(self, name: str, old_owner: str, new_owner: str) -> None:
+        if not name.startswith(MPRIS_PREFIX):
+            return
+
+        if name in self.players:
+            self.players.remove(name)
+        self.owners.pop(old_owner, None)
+        self.states.pop(name, None)
+
+        if new_owner:
+            # Tell about the new player once its properties are known
+            self.players.append(name)
+            create_task(self._follow(name, new_owner))
+        else:
+            self._changed()
+
+    def _update(self, name: str, properties: dict[str, Any]) -> None:
+        """Take the status and track from changed player properties"""
+        state = self.states.setdefault(name, {"status": "Stopped"})
+
+        if "PlaybackStatus" in properties:
+            state["status"] = properties["PlaybackStatus"].value
+
+        if "Metadata" in properties:
+            metadata = properties["Metadata"].value
+            artists = metadata.get("xesam:artist")
+            title = metadata.get("xesam:title")
+            state["artist"] = ", ".join(artists.value) if artists is not None else ""
+            state["title"] = title.value if title is not None else ""
+
+    def _changed(self, force: bool = False) -> None:
+        """Tell about the track of the active player, if anything changed"""
+        active = self.active
+        track = (
+            None
+            if active is None
+            else {"player": active, **self.states.get(active, {})}
+        )
+
+        if track == self.track and not force:
+            return
+
+        self.track = track
+
+        if self.on_change is not None:
+            self.on_change(track)
+
+    @property
+    def active(self) -> str | None:
+        """Bus name of the player being controlled"""
+        for name in reversed(self.players):
+            if self.states.get(name, {}).get("status") == "Playing":
+                return name
+
+        return self.players[-1] if self.players else None
+
+    def call(self, method: str) -> None:
+        """Send a method call to the active player without waiting for a reply"""
+        if self.bus is None or self.active is None:
+            return
+
+        self.bus.send(
+            Message(
+                destination=self.active,
+                path=MPRIS_PATH,
+                interface=PLAYER_INTERFACE,
+                member=method,
+                flags=MessageFlag.NO_REPLY_EXPECTED,
+            )
+        )
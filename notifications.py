@@ -0,0 +1,102 @@
+"""
+Posting desktop notifications over one long-lived connection
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+from libqtile.utils import dbus_bus_connections
+
+try:
+    from dbus_next import DBusError, Message, Variant
+    from dbus_next.aio import MessageBus
+    from dbus_next.constants import BusType, MessageType
+    from dbus_next.errors import AuthError, InvalidAddressError
+
+    has_dbus = True
+except ImportError:
+    has_dbus = False
+
+if TYPE_CHECKING:
+    from typing import Any
+
+NOTIFICATIONS_NAME = "org.freedesktop.Notifications"
+NOTIFICATIONS_PATH = "/org/freedesktop/Notifications"
+
+URGENCY = {"low": 0, "normal": 1, "critical": 2}
+
+
+class Notifier:
+    """A single org.freedesktop.Notifications client for the whole config
+
+    Every notification belongs to a topic, and a new notification on a
+    topic replaces the previous one instead of stacking up. Posting is one
+    method call on the connection made at startup.
+
+    A connected bus can be passed in, to post to a stand-in server."""
+
+    def __init__(
+        self, app_name: str = "qtile", timeout: int = 3000, bus: Any = None
+    ) -> None:
+        self.app_name = app_name
+        self.timeout = timeout
+        self.bus = bus
+        self.ids: dict[str, int] = {}
+
+    async def connect(self) -> None:
+        """Connect to the session bus"""
+        if self.bus is not None:
+            return
+
+        if not has_dbus:
+            logger.warning("dbus-next is not installed. Notifications will not work.")
+            return
+
+        try:
+            self.bus = await MessageBus(bus_type=BusType.SESSION).connect()
+        except (OSError, AuthError, DBusError, InvalidAddressError):
+            logger.warning("Unable to connect to dbus for notifications.")
+            return
+
+        # Let qtile close the connection on reload and shutdown
+        dbus_bus_connections.add(self.bus)
+
+    async def notify(
+        self,
+        topic: str,
+        summary: str,
+        body: str = "",
+        icon: str = "",
+        urgency: str = "normal",
+    ) -> None:
+        """Post a notification, replacing the last one of the same topic"""
+        if self.bus is None:
+            return
+
+        reply = await self.bus.call(
+            Message(
+                destination=NOTIFICATIONS_NAME,
+                path=NOTIFICATIONS_PATH,
+                interface=NOTIFICATIONS_NAME,
+                member="Notify",
+                signature="susssasa{sv}i",
+                body=[
+                    self.app_name,
+                    self.ids.get(topic, 0),
+                    icon,
+                    summary,
+                    body,
+                    [],
+                    {"urgency": Variant("y", URGENCY[urgency])},
+                    self.timeout,
+                ],
+            )
+        )
+
+        if reply is None or reply.message_type == MessageType.ERROR:
+            logger.warning("Unable to post the %s notification", topic)
+            return
+
+        self.ids[topic] = reply.body[0]
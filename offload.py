@@ -0,0 +1,174 @@
+"""
+Running blocking work off the event loop
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable
+    from concurrent.futures import Future
+    from typing import Any
+
+    Job = tuple[Callable[..., Any], tuple[Any, ...], asyncio.Future | None]
+
+
+class Executor:
+    """A few threads for file writes and sysfs
+
+    Work is queued per target, a file or device or anything else that
+    needs its writes in order. A target has at most one job on the threads
+    at a time, and its jobs run and finish in the order they were queued.
+    Different targets run side by side, on at most `workers` threads.
+
+    Without an event loop there is nothing to keep free, and once closed
+    nothing to run on, so jobs run straight away."""
+
+    def __init__(self, workers: int = 2) -> None:
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="qtile-offload"
+        )
+        self.queues: dict[Hashable, collections.deque[Job]] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.closed = False
+        self.stats: dict[str, int] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "max_queued": 0,
+        }
+
+    def submit(self, target: Hashable, func: Callable[..., Any], *args: Any) -> None:
+        """Queue a job, failures are logged"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.stats["submitted"] += 1
+            self._run_now(target, (func, args, None))
+            return
+
+        self._queue(loop, target, (func, args, None))
+
+    def run(
+        self, target: Hashable, func: Callable[..., Any], *args: Any
+    ) -> asyncio.Future:
+        """Queue a job and wait for its result, or its exception"""
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+        self._queue(loop, target, (func, args, result))
+        return result
+
+    def _queue(
+        self, loop: asyncio.AbstractEventLoop, target: Hashable, job: Job
+    ) -> None:
+        self.stats["submitted"] += 1
+
+        if self.closed:
+            self._run_now(target, job)
+            return
+
+        if loop is not self.loop:
+            # Jobs left by a loop that stopped would never hand over to the next
+            self.loop = loop
+            self.queues.clear()
+
+        queue = self.queues.get(target)
+
+        if queue is None:
+            self.queues[target] = collections.deque()
+            self._start(loop, target, job)
+            return
+
+        queue.append(job)
+        self.stats["max_queued"] = max(self.stats["max_queued"], len(queue))
+
+    def _start(
+        self, loop: asyncio.AbstractEventLoop, target: Hashable, job: Job
+    ) -> None:
+        func, args, _result = job
+        future = self.pool.submit(func, *args)
+
+        def finished(future: Future) -> None:
+            # The loop is gone if this comes after qtile stopped
+            with contextlib.suppress(RuntimeError):
+                loop.call_soon_threadsafe(self._done, loop, target, job, future)
+
+        future.add_done_callback(finished)
+
+    def _done(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        target: Hashable,
+        job: Job,
+        future: Future,
+    ) -> None:
+        """Hand over the outcome of a job and start the next of its target"""
+        if future.cancelled():
+            # Dropped by close before it started
+            if job[2] is not None:
+                job[2].cancel()
+        else:
+            error = future.exception()
+            self._deliver(target, job, None if error else future.result(), error)
+
+        queue = self.queues.get(target)
+        if queue:
+            self._start(loop, target, queue.popleft())
+        else:
+            self.queues.pop(target, None)
+
+    def _run_now(self, target: Hashable, job: Job) -> None:
+        func, args, _result = job
+        try:
+            value = func(*args)
+        except Exception as error:  # noqa: BLE001, delivered like a failure on the threads
+            self._deliver(target, job, None, error)
+        else:
+            self._deliver(target, job, value, None)
+
+    def _deliver(
+        self, target: Hashable, job: Job, value: Any, error: BaseException | None
+    ) -> None:
+        func, _args, result = job
+
+        if error is None:
+            self.stats["completed"] += 1
+        else:
+            self.stats["failed"] += 1
+
+        if result is not None:
+            if result.done():
+                return
+            if error is None:
+                result.set_result(value)
+            else:
+                result.set_exception(error)
+        elif error is not None:
+            logger.error("Unable to run %s for %s", _name(func), target, exc_info=error)
+
+    def close(self) -> None:
+        """Drop the jobs that haven't started, for shutdown
+
+        Jobs already on the threads aren't waited for."""
+        self.closed = True
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+        queues, self.queues = self.queues, {}
+        for queue in queues.values():
+            for _func, _args, result in queue:
+                if result is not None:
+                    result.cancel()
+
+
+def _name(func: Callable[..., Any]) -> str:
+    if isinstance(func, functools.partial):
+        func = func.func
+    return getattr(func, "__qualname__", None) or repr(func)
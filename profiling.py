@@ -0,0 +1,267 @@
+"""
+Measuring how long hook handlers and key functions take
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+# Bucket n counts calls that took less than 2**n microseconds, the last one
+# everything slower than about 16 seconds
+BUCKETS = 25
+PERCENTILES = (50, 90, 99)
+
+
+class Histogram:
+    """Call count and latency distribution of one function
+
+    The buckets are powers of two of a microsecond, so recording a call is
+    a bit_length and an increment however long it runs."""
+
+    __slots__ = ("buckets", "count", "max", "total")
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget all calls"""
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, nanoseconds: int) -> None:
+        """Add one call"""
+        # Plain comparisons, min() and max() would cost more than the rest
+        bucket = (nanoseconds // 1000).bit_length()
+        self.buckets[bucket if bucket < BUCKETS else BUCKETS - 1] += 1
+        self.count += 1
+        self.total += nanoseconds
+        if nanoseconds > self.max:  # noqa: PLR1730
+            self.max = nanoseconds
+
+    def percentile(self, percent: float) -> float:
+        """Upper bound in milliseconds of the bucket the percentile falls in"""
+        if not self.count:
+            return 0.0
+
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen * 100 >= self.count * percent:
+                break
+
+        return min(2**bucket / 1000, self.max / 1e6)
+
+    def summary(self) -> dict[str, Any]:
+        """Count, mean, max and percentiles in milliseconds"""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count / 1e6 if self.count else 0.0,
+            "max": self.max / 1e6,
+            **{f"p{percent}": self.percentile(percent) for percent in PERCENTILES},
+            "buckets": self.buckets,
+        }
+
+
+class _Subscribe:
+    def __init__(self, profiler: Profiler, subscribe: Any) -> None:
+        self._profiler = profiler
+        self._subscribe = subscribe
+
+    def __getattr__(self, event: str) -> Callable[[Callable], Callable]:
+        subscribe = getattr(self._subscribe, event)
+
+        def decorator(func: Callable) -> Callable:
+            subscribe(self._profiler.profile(func, f"{event}:{_name(func)}"))
+            # Handing back the plain function lets decorators be stacked
+            return func
+
+        return decorator
+
+
+def _name(func: Callable) -> str:
+    return getattr(func, "__qualname__", None) or repr(func)
+
+
+class Profiler:
+    """Latency histograms of everything wrapped by it
+
+    Handlers subscribed through `subscribe` are wrapped per hook, so a
+    handler on several hooks gets a histogram for each. Coroutines are
+    timed until they finish, which includes the time spent waiting. The
+    name of the plain function running right now is kept in `running`."""
+
+    def __init__(self) -> None:
+        self.histograms: dict[str, Histogram] = {}
+        self.running: str | None = None
+
+    def subscribe(self, subscribe: Any) -> _Subscribe:
+        """Stands in for hook.subscribe, timing every handler"""
+        return _Subscribe(self, subscribe)
+
+    def profile(self, func: Callable, name: str | None = None) -> Callable:
+        """Wrap a function so every call is recorded"""
+        name = name or _name(func)
+        histogram = self.histograms.setdefault(name, Histogram())
+        clock = time.perf_counter_ns
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapped_async(*args: Any, **kwargs: Any) -> Any:
+                start = clock()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.record(clock() - start)
+
+            return wrapped_async
+
+        @functools.wraps(func)
+        def wrapped(*args: Any, **kwargs: Any) -> Any:
+            # Hooks fired from within a handler run nested, so put back the outer one
+            outer, self.running = self.running, name
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.record(clock() - start)
+                self.running = outer
+
+        return wrapped
+
+    def stats(self, slowest: int | None = None) -> dict[str, dict[str, Any]]:
+        """Summaries of everything that was called, slowest p99 first"""
+        summaries = {
+            name: histogram.summary()
+            for name, histogram in self.histograms.items()
+            if histogram.count
+        }
+        names = sorted(summaries, key=lambda name: summaries[name]["p99"], reverse=True)
+        return {name: summaries[name] for name in names[:slowest]}
+
+    def report(self, slowest: int = 20) -> str:
+        """A table of the slowest functions, to be read through qtile cmd-obj"""
+        lines = [
+            f"{'function':<50} {'count':>7} {'mean':>8} {'p50':>8} {'p99':>8} {'max':>8}"
+        ]
+        for name, summary in self.stats(slowest).items():
+            lines.append(
+                f"{name[:50]:<50} {summary['count']:>7} {summary['mean']:>8.3f}"
+                f" {summary['p50']:>8.3f} {summary['p99']:>8.3f} {summary['max']:>8.3f}"
+            )
+        return "\n".join(lines)
+
+    def dump(self, path: str) -> str:
+        """Write the statistics to a JSON file"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as output:
+            json.dump(self.stats(), output, indent=2)
+
+        logger.info("Hook statistics written to %s", path)
+        return path
+
+    def reset(self) -> None:
+        """Start counting from zero"""
+        for histogram in self.histograms.values():
+            histogram.clear()
+
+
+class Watchdog:
+    """Logs whatever holds the event loop for longer than `threshold` seconds
+
+    A thread pings the loop twice per threshold. When a ping is still not
+    answered after the threshold, the handler the profiler says is running
+    is logged with the stack of the loop's thread, once per stall. Blocking
+    in a coroutine or in qtile itself has no handler name, the stack shows
+    where it is. How long each stall lasted in the end is logged as well.
+
+    The pings keep an idle loop waking up, so this is meant for when
+    something is being tracked down rather than to be left running."""
+
+    def __init__(self, profiler: Profiler, threshold: float = 0.1) -> None:
+        self.profiler = profiler
+        self.threshold = threshold
+        self.stalls: dict[str, int] = {}
+        self.longest = 0.0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread_id = 0
+        self._stop = threading.Event()
+        self._sent = 0.0
+        self._answered = True
+        self._reported = False
+
+    def start(self) -> None:
+        """Start watching the running loop, from the loop's thread"""
+        if self._loop is not None:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        # A thread of its own, so one that was stopped can't be woken up again
+        self._stop = threading.Event()
+        threading.Thread(
+            target=self._watch,
+            args=(self._loop, self._stop),
+            name="qtile-watchdog",
+            daemon=True,
+        ).start()
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, stop: threading.Event) -> None:
+        while not stop.wait(self.threshold / 2):
+            now = time.monotonic()
+
+            if self._answered:
+                self._answered = False
+                self._reported = False
+                self._sent = now
+                try:
+                    loop.call_soon_threadsafe(self._pong)
+                except RuntimeError:
+                    return
+            elif not self._reported and now - self._sent >= self.threshold:
+                self._reported = True
+                self._report(now - self._sent)
+
+    def _pong(self) -> None:
+        """The loop got around to the ping"""
+        if self._reported:
+            held = time.monotonic() - self._sent
+            self.longest = max(self.longest, held)
+            logger.warning("The event loop was held for %.0f ms", held * 1000)
+        self._answered = True
+
+    def _report(self, held: float) -> None:
+        name = self.profiler.running or "Something outside the config"
+        self.stalls[name] = self.stalls.get(name, 0) + 1
+
+        frame = sys._current_frames().get(self._thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+
+        logger.warning(
+            "%s has held the event loop for %.0f ms, at:\n%s",
+            name,
+            held * 1000,
+            stack,
+        )
+
+    def close(self) -> None:
+        """Stop the thread"""
+        self._stop.set()
+        self._loop = None
+        self._answered = True
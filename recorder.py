@@ -0,0 +1,145 @@
+"""
+Recording the hooks the config receives, to replay them later
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import time
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+    from libqtile.core.manager import Qtile
+
+    from offload import Executor
+
+# The hooks this config listens to
+HOOKS = (
+    "client_new",
+    "client_managed",
+    "client_killed",
+    "client_focus",
+    "client_name_updated",
+    "client_urgent_hint_changed",
+    "focus_change",
+    "float_change",
+    "layout_change",
+    "group_window_add",
+    "current_screen_change",
+    "setgroup",
+    "startup_complete",
+)
+
+
+def snapshot(arg: Any) -> Any:
+    """Just enough of a hook argument to stand in for it on replay"""
+    if hasattr(arg, "wid"):
+        group = getattr(arg, "group", None)
+        return {
+            "w": arg.wid,
+            "c": arg.get_wm_class(),
+            "n": getattr(arg, "name", ""),
+            "g": None if group is None else group.name,
+            "f": int(bool(getattr(arg, "floating", False))),
+            "F": int(bool(getattr(arg, "fullscreen", False))),
+        }
+
+    if hasattr(arg, "windows"):
+        return {"group": arg.name}
+
+    if hasattr(arg, "name"):
+        return {"layout": arg.name}
+
+    return None
+
+
+class HookRecorder:
+    """Appends every hook invocation to a log, one JSON array per line
+
+    An entry holds the seconds since recording started, the hook, the
+    current group and window, and a snapshot of each argument. Subscribing
+    before the other handlers keeps hooks fired by a handler after the hook
+    that caused them. Lines are buffered and written out once a second, by
+    the executor if there is one."""
+
+    def __init__(
+        self,
+        path: str,
+        qtile: Qtile,
+        flush_interval: float = 1,
+        executor: Executor | None = None,
+    ) -> None:
+        self.path = path
+        self.qtile = qtile
+        self.flush_interval = flush_interval
+        self.executor = executor
+        self.start = time.monotonic()
+        # Open for as long as the recorder is, closed by close()
+        self.output = open(path, "a", encoding="utf-8")  # noqa: SIM115
+        self.lines: list[str] = []
+        self._handle: asyncio.TimerHandle | None = None
+        logger.info("Recording hooks to %s", path)
+
+    def subscribe(self, subscribe: Any, hooks: tuple[str, ...] = HOOKS) -> None:
+        """Start recording, to be called before any other handler subscribes"""
+        for name in hooks:
+            getattr(subscribe, name)(self._recorder(name))
+
+    def _recorder(self, name: str) -> Callable[..., None]:
+        def record(*args: Any) -> None:
+            self.record(name, args)
+
+        return record
+
+    def record(self, name: str, args: tuple) -> None:
+        """Add one hook invocation to the log"""
+        current_window = self.qtile.current_window  # type: ignore[attr-defined]
+        entry = [
+            round(time.monotonic() - self.start, 6),
+            name,
+            self.qtile.current_group.name,  # type: ignore[attr-defined]
+            None if current_window is None else current_window.wid,
+            [snapshot(arg) for arg in args],
+        ]
+        self.lines.append(json.dumps(entry, separators=(",", ":")) + "\n")
+
+        if self._handle is None:
+            with contextlib.suppress(RuntimeError):
+                self._handle = asyncio.get_running_loop().call_later(
+                    self.flush_interval, self.flush
+                )
+
+    def flush(self) -> None:
+        """Write buffered entries to disk"""
+        self._handle = None
+        if not self.lines:
+            return
+
+        text, self.lines = "".join(self.lines), []
+        self._run(self._write, text)
+
+    def _write(self, text: str) -> None:
+        self.output.write(text)
+        self.output.flush()
+
+    def _run(self, func: Callable[..., None], *args: Any) -> None:
+        # Only ever written from one thread at a time, in order
+        if self.executor is None:
+            func(*args)
+        else:
+            self.executor.submit(self.path, func, *args)
+
+    def close(self) -> None:
+        """Stop recording"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self.flush()
+        self._run(self.output.close)
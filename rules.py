@@ -0,0 +1,62 @@
+"""
+Deciding where windows go
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any
+
+# Characters are never empty, so an empty key marks the end of a prefix
+END = ""
+
+
+class PlacementRules:
+    """Group assignments compiled into a prefix trie of lowercased classes
+
+    The first rule in the assignments that matches wins, and the decision for
+    each wm_class is remembered in a bounded cache."""
+
+    def __init__(self, assignments: dict[str, Any], cache_size: int = 256) -> None:
+        self.trie: dict[str, Any] = {}
+
+        for index, (group, apps) in enumerate(assignments.items()):
+            for prefix in (apps,) if isinstance(apps, str) else apps:
+                node = self.trie
+                for char in prefix.lower():
+                    node = node.setdefault(char, {})
+                node.setdefault(END, (index, group))
+
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, wm_class: tuple[str, ...]) -> str | None:
+        """Walk the trie for every class item and keep the earliest rule"""
+        best: tuple[int, str] | None = None
+
+        for item in wm_class:
+            node = self.trie
+            for char in item.lower():
+                if END in node and (best is None or node[END] < best):
+                    best = node[END]
+                child = node.get(char)
+                if child is None:
+                    break
+                node = child
+            else:
+                if END in node and (best is None or node[END] < best):
+                    best = node[END]
+
+        return None if best is None else best[1]
+
+    def match(self, wm_class: list[str]) -> str | None:
+        """Name of the group a window with this wm_class belongs to, if any"""
+        return self.lookup(tuple(wm_class))
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Decision cache hits and misses"""
+        info = self.lookup.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
@@ -0,0 +1,122 @@
+"""
+Rules and theme read from a data file, applied again when it changes
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import tomllib
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+
+from watch import IN_CLOSE_WRITE, IN_MOVED_TO, Watcher
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+    Applier = Callable[[Any], None]
+
+
+class Settings:
+    """Sections of a TOML file, each applied by the functions registered for it
+
+    The directory the file really is in is watched, following a symlink,
+    since editors often replace a file instead of writing to it. When the
+    file changes, only the sections that differ from the ones in use are
+    applied, in the order the sections were registered. A file that
+    doesn't load is logged and the settings in use are kept.
+
+    The file has to load when the config does, just like the config itself."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.data: dict[str, Any] = self._read()
+        self.appliers: dict[str, list[Applier]] = {}
+        self._version = self._stat()
+        self._watcher: Watcher | None = None
+        self.stats: dict[str, int | float] = {"applied": 0, "rejected": 0, "ms": 0.0}
+
+    def __getitem__(self, section: str) -> Any:
+        return self.data[section]
+
+    def _read(self) -> dict[str, Any]:
+        with open(self.path, "rb") as file:
+            return tomllib.load(file)
+
+    def _stat(self) -> tuple[int, int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def on(self, section: str) -> Callable[[Applier], Applier]:
+        """Register a function to apply a section with when it changes"""
+
+        def register(func: Applier) -> Applier:
+            self.appliers.setdefault(section, []).append(func)
+            return func
+
+        return register
+
+    def watch(self) -> None:
+        """Start following the file, picking up changes made since it was read"""
+        if self._watcher is None:
+            directory = os.path.dirname(os.path.realpath(self.path))
+            self._watcher = Watcher(
+                directory, self._changed, IN_CLOSE_WRITE | IN_MOVED_TO
+            )
+
+        self._changed()
+
+    def _changed(self) -> None:
+        """Something changed in the directory, which may not be the file"""
+        version = self._stat()
+        if version is None or version == self._version:
+            return
+
+        self._version = version
+
+        try:
+            data = self._read()
+        except (OSError, tomllib.TOMLDecodeError) as error:
+            self.stats["rejected"] += 1
+            logger.warning("Keeping the settings in use, %s: %s", self.path, error)
+            return
+
+        self.apply(data)
+
+    def apply(self, data: dict[str, Any]) -> list[str]:
+        """Apply the sections that changed, missing sections are left as they are"""
+        start = time.perf_counter()
+
+        changed = [
+            section
+            for section in self.appliers
+            if section in data and data[section] != self.data.get(section)
+        ]
+        self.data = {**self.data, **data}
+
+        for section in changed:
+            for func in self.appliers[section]:
+                try:
+                    func(self.data[section])
+                except Exception:
+                    logger.exception("Unable to apply the %s settings", section)
+
+        if changed:
+            ms = (time.perf_counter() - start) * 1000
+            self.stats["applied"] += 1
+            self.stats["ms"] += ms
+            logger.info("Applied %s settings in %.2f ms", ", ".join(changed), ms)
+
+        return changed
+
+    def close(self) -> None:
+        """Stop following the file"""
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
@@ -5,7 +5,7 @@ qtileconfig=$(pwd)
 mkdir -p ~/.config/qtile
 
 for file in ${qtileconfig}/*; do 
-    if [[ "${file##*/}" == *.py ]]
+    if [[ "${file##*/}" == *.py || "${file##*/}" == *.toml ]]
     then ln -s ${file} ~/.config/qtile/
     fi 
 done
@@ -0,0 +1,230 @@
+"""
+Reading system status for the notification keys
+"""
+
+from __future__ import annotations
+
+import datetime
+import os
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+from libqtile.utils import create_task, dbus_bus_connections
+
+try:
+    from dbus_next import DBusError, Message
+    from dbus_next.aio import MessageBus
+    from dbus_next.constants import BusType, MessageType
+    from dbus_next.errors import AuthError, InvalidAddressError
+
+    has_dbus = True
+except ImportError:
+    has_dbus = False
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from notifications import Notifier
+    from offload import Executor
+    from volume import VolumeController
+
+POWER_SUPPLY_ROOT = "/sys/class/power_supply"
+
+IWD_NAME = "net.connman.iwd"
+STATION_INTERFACE = "net.connman.iwd.Station"
+NETWORK_INTERFACE = "net.connman.iwd.Network"
+DEVICE_INTERFACE = "net.connman.iwd.Device"
+OBJECT_MANAGER = "org.freedesktop.DBus.ObjectManager"
+
+
+def _read(path: str) -> str | None:
+    try:
+        with open(path, encoding="ascii") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def battery_status(root: str = POWER_SUPPLY_ROOT) -> tuple[str, str] | None:
+    """Charge and state of the batteries, and whether AC is plugged in"""
+    try:
+        supplies = sorted(os.listdir(root))
+    except OSError:
+        return None
+
+    batteries = []
+    plugged = False
+
+    for name in supplies:
+        path = os.path.join(root, name)
+        kind = _read(os.path.join(path, "type"))
+
+        if kind == "Mains":
+            plugged = plugged or _read(os.path.join(path, "online")) == "1"
+        elif kind == "Battery" and (capacity := _read(f"{path}/capacity")):
+            status = _read(os.path.join(path, "status")) or "Unknown"
+            batteries.append(f"{name}: {capacity}% {status.lower()}{_remaining(path)}")
+
+    if not batteries:
+        return None
+
+    return "Battery", "\n".join(batteries + (["AC plugged in"] if plugged else []))
+
+
+def _remaining(path: str) -> str:
+    """Time left until empty while discharging, from energy or charge"""
+    if _read(os.path.join(path, "status")) != "Discharging":
+        return ""
+
+    for now, rate in (("energy_now", "power_now"), ("charge_now", "current_now")):
+        level = _read(os.path.join(path, now))
+        drain = _read(os.path.join(path, rate))
+        if level and drain and level.isdigit() and drain.isdigit() and int(drain):
+            minutes = int(level) * 60 // int(drain)
+            return f", {minutes // 60}:{minutes % 60:02} left"
+
+    return ""
+
+
+def clock_status(now: datetime.datetime | None = None) -> tuple[str, str]:
+    """The time, date and week number"""
+    now = now or datetime.datetime.now()
+    return now.strftime("%H:%M"), now.strftime("%A %-d %B\nWeek %V")
+
+
+class WifiStatus:
+    """Asks iwd about the wireless connection over one system bus connection
+
+    A connected bus can be passed in, to run against a stand-in iwd."""
+
+    def __init__(self, bus: Any = None) -> None:
+        self.bus = bus
+
+    async def connect(self) -> None:
+        """Connect to the system bus, where iwd lives"""
+        if self.bus is not None:
+            return
+
+        if not has_dbus:
+            logger.warning("dbus-next is not installed. Wifi status will not work.")
+            return
+
+        try:
+            self.bus = await MessageBus(bus_type=BusType.SYSTEM).connect()
+        except (OSError, AuthError, DBusError, InvalidAddressError):
+            logger.warning("Unable to connect to the system bus for wifi status.")
+            return
+
+        # Let qtile close the connection on reload and shutdown
+        dbus_bus_connections.add(self.bus)
+
+    async def _call(self, path: str, interface: str, member: str) -> list | None:
+        reply = await self.bus.call(
+            Message(destination=IWD_NAME, path=path, interface=interface, member=member)
+        )
+        if reply is None or reply.message_type == MessageType.ERROR:
+            return None
+        return reply.body
+
+    async def status(self) -> tuple[str, str] | None:
+        """The state of every station, with the network and its signal"""
+        if self.bus is None:
+            return None
+
+        body = await self._call("/", OBJECT_MANAGER, "GetManagedObjects")
+        if body is None:
+            return "Wifi", "iwd is not running"
+
+        objects: dict[str, dict[str, dict[str, Any]]] = body[0]
+        lines = []
+
+        for path, interfaces in sorted(objects.items()):
+            if STATION_INTERFACE not in interfaces:
+                continue
+
+            station = interfaces[STATION_INTERFACE]
+            device = interfaces.get(DEVICE_INTERFACE, {}).get("Name")
+            name = device.value if device is not None else path.rsplit("/", 1)[-1]
+            state = station["State"].value
+
+            if "ConnectedNetwork" not in station:
+                lines.append(f"{name}: {state}")
+                continue
+
+            network_path = station["ConnectedNetwork"].value
+            network = objects.get(network_path, {}).get(NETWORK_INTERFACE, {})
+            ssid = network["Name"].value if "Name" in network else "unknown"
+            lines.append(
+                f"{name}: {state} to {ssid}{await self._signal(path, network_path)}"
+            )
+
+        return "Wifi", "\n".join(lines) or "No wireless device"
+
+    async def _signal(self, station: str, network: str) -> str:
+        body = await self._call(station, STATION_INTERFACE, "GetOrderedNetworks")
+        for path, strength in body[0] if body else ():
+            if path == network:
+                # Strength is in 100 * dBm, -100 dBm is unusable and -50 dBm perfect
+                return f" ({min(max(2 * (strength // 100 + 100), 0), 100)}%)"
+        return ""
+
+
+class StatusNotifications:
+    """Shows the status of something as a notification, one topic per key
+
+    Each topic replaces its own previous notification. With an executor,
+    the power supply is read from its threads."""
+
+    def __init__(
+        self,
+        notifier: Notifier,
+        volume: VolumeController,
+        wifi: WifiStatus,
+        power_supply: str = POWER_SUPPLY_ROOT,
+        executor: Executor | None = None,
+    ) -> None:
+        self.notifier = notifier
+        self.volume = volume
+        self.wifi = wifi
+        self.power_supply = power_supply
+        self.executor = executor
+
+    async def connect(self) -> None:
+        await self.notifier.connect()
+        await self.wifi.connect()
+
+    def show(self, topic: str) -> None:
+        """Look up a topic and post it, without waiting for either"""
+        create_task(self.post(topic))
+
+    async def post(self, topic: str) -> None:
+        try:
+            status = await getattr(self, f"_{topic}")()
+        except Exception:
+            logger.exception("Unable to read %s status", topic)
+            return
+
+        if status is not None:
+            summary, body = status
+            await self.notifier.notify(topic, summary, body)
+
+    async def _battery(self) -> tuple[str, str] | None:
+        if self.executor is None:
+            status = battery_status(self.power_supply)
+        else:
+            status = await self.executor.run(
+                self.power_supply, battery_status, self.power_supply
+            )
+        return status or ("Battery", "No battery")
+
+    async def _date(self) -> tuple[str, str]:
+        return clock_status()
+
+    async def _wifi(self) -> tuple[str, str] | None:
+        return await self.wifi.status()
+
+    async def _mic(self) -> tuple[str, str] | None:
+        muted = await self.volume.toggle_source_mute()
+        if muted is None:
+            return None
+        return "Microphone", "Muted" if muted else "Unmuted"
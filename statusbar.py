@@ -0,0 +1,389 @@
+"""
+Streaming bar state to Waybar
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import socket
+import weakref
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+
+class StatusChannel:
+    """Broadcast JSON lines to Waybar modules over a Unix socket
+
+    Waybar keeps one `socat` per module connected to the socket, so an update
+    is a single write per connected module with no process spawns.
+
+    What a client's socket doesn't take at once is kept for it and written
+    when the socket has room again. Every line is the whole state, so only
+    the rest of the line on its way and the newest one are kept."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.clients: list[socket.socket] = []
+        self.pending: dict[socket.socket, list[bytes]] = {}
+        self.last: bytes = b""
+        self._server: socket.socket | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def open(self) -> None:
+        """Start listening, taking over the socket path from any previous config"""
+        if self._server is not None:
+            return
+
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.setblocking(False)
+        self._server.bind(self.path)
+        self._server.listen()
+
+        with contextlib.suppress(RuntimeError):
+            self.attach(asyncio.get_running_loop())
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Accept new connections as soon as they arrive on the event loop"""
+        assert self._server is not None, "The channel should be open"
+        self._loop = loop
+        # Only keep a weak reference so a reloaded config can drop this channel
+        accept = weakref.WeakMethod(self._accept)
+        loop.add_reader(self._server, lambda: (method := accept()) and method())
+
+    def _accept(self) -> None:
+        """Take all pending connections and bring them up to date"""
+        assert self._server is not None, "The channel should be open"
+
+        while True:
+            try:
+                client, _address = self._server.accept()
+            except BlockingIOError:
+                return
+            except OSError:
+                logger.exception("Unable to accept status bar client")
+                return
+
+            client.setblocking(False)
+            self.clients.append(client)
+
+            if self.last:
+                self._send(client, self.last)
+
+    def _send(self, client: socket.socket, line: bytes) -> None:
+        pending = self.pending.get(client)
+
+        if pending is not None:
+            pending[1:] = [line]
+            if self._loop is None:
+                # Nothing tells us when there is room, so try again now
+                self._write_pending(client)
+            return
+
+        try:
+            sent = client.send(line)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            # Waybar went away, it will reconnect
+            self._drop(client)
+            return
+
+        if sent < len(line):
+            self.pending[client] = [line[sent:]]
+            if self._loop is not None:
+                write = weakref.WeakMethod(self._write_pending)
+                self._loop.add_writer(
+                    client, lambda: (method := write()) and method(client)
+                )
+
+    def _write_pending(self, client: socket.socket) -> None:
+        """Write what is left for a client, for as long as its socket takes it"""
+        pending = self.pending.get(client)
+
+        while pending:
+            try:
+                sent = client.send(pending[0])
+            except BlockingIOError:
+                return
+            except OSError:
+                self._drop(client)
+                return
+
+            if sent < len(pending[0]):
+                pending[0] = pending[0][sent:]
+                return
+
+            pending.pop(0)
+
+        self._forget_pending(client)
+
+    def _forget_pending(self, client: socket.socket) -> None:
+        if self.pending.pop(client, None) is not None and self._loop is not None:
+            self._loop.remove_writer(client)
+
+    def _drop(self, client: socket.socket) -> None:
+        self._forget_pending(client)
+        client.close()
+        if client in self.clients:
+            self.clients.remove(client)
+
+    def publish(self, payload: dict[str, str]) -> None:
+        """Send a message to every connected module"""
+        self.open()
+
+        # Accept here as well, in case there is no event loop to tell us
+        self._accept()
+
+        self.last = (json.dumps(payload, ensure_ascii=False) + "\n").encode()
+
+        for client in self.clients.copy():
+            self._send(client, self.last)
+
+    def close(self) -> None:
+        """Disconnect all clients and stop listening"""
+        if self._server is None:
+            return
+
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.remove_reader(self._server)
+            for client in self.pending:
+                self._loop.remove_writer(client)
+        self._loop = None
+
+        for client in self.clients:
+            client.close()
+
+        self.clients.clear()
+        self.pending.clear()
+        self._server.close()
+        self._server = None
+
+    def __del__(self) -> None:
+        with contextlib.suppress(Exception):
+            self.close()
+
+
+class StatusBar:
+    """Collects the bar segments and publishes them together as one message
+
+    Hooks only mark segments as dirty. Dirty segments are rendered and
+    published once per `delay` seconds, so a burst of events is merged into
+    a single flush. Nothing is sent when the text comes out the same."""
+
+    def __init__(
+        self,
+        channel: StatusChannel,
+        order: tuple[str, ...],
+        separator: str = " ",
+        delay: float = 0.016,
+    ) -> None:
+        self.channel = channel
+        self.order = order
+        self.separator = separator
+        self.delay = delay
+        self.segments: dict[str, str] = dict.fromkeys(order, "")
+        self.renderers: dict[str, Callable[[], str]] = {}
+        self.dirty: set[str] = set()
+        self.text: str | None = None
+        self.stats: dict[str, int] = {
+            "events": 0,
+            "flushes": 0,
+            "unchanged": 0,
+            "last_merged": 0,
+            "max_merged": 0,
+        }
+        self._merged = 0
+        self._handle: asyncio.TimerHandle | None = None
+
+    def renderer(self, name: str) -> Callable[[Callable[[], str]], Callable[[], str]]:
+        """Register the function rendering the markup of a segment"""
+
+        def register(func: Callable[[], str]) -> Callable[[], str]:
+            self.renderers[name] = func
+            return func
+
+        return register
+
+    def schedule(self, *names: str) -> None:
+        """Mark segments as dirty and flush them after the delay"""
+        self.dirty.update(names)
+        self.stats["events"] += 1
+        self._merged += 1
+
+        if self._handle is not None:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+
+        self._handle = loop.call_later(self.delay, self.flush)
+
+    def flush(self) -> None:
+        """Render the dirty segments and publish all of them as a single line"""
+        self._handle = None
+        dirty, self.dirty = self.dirty, set()
+
+        for name in dirty:
+            try:
+                self.segments[name] = self.renderers[name]()
+            except Exception:
+                logger.exception("Unable to render bar segment %s", name)
+
+        self.stats["flushes"] += 1
+        self.stats["last_merged"] = self._merged
+        self.stats["max_merged"] = max(self.stats["max_merged"], self._merged)
+        self._merged = 0
+
+        text = self.separator.join(
+            self.segments[name] for name in self.order if self.segments[name]
+        )
+
+        if text == self.text:
+            self.stats["unchanged"] += 1
+            return
+
+        self.text = text
+        self.channel.publish({"text": text})
+
+    def cancel(self) -> None:
+        """Drop a pending flush"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+
+class OutputBars:
+    """A StatusBar per output, each publishing on its own socket
+
+    Renderers are shared and given the screen of the output they render
+    for, so a change on one monitor only re-renders the bar of that
+    monitor. The socket path has an `{output}` field for the output name.
+    While paused nothing is scheduled at all, and resuming renders
+    everything again."""
+
+    def __init__(
+        self,
+        path: str,
+        order: tuple[str, ...],
+        separator: str = " ",
+        delay: float = 0.016,
+    ) -> None:
+        self.path = path
+        self.order = order
+        self.separator = separator
+        self.delay = delay
+        self.bars: dict[str, StatusBar] = {}
+        self.screens: dict[str, Any] = {}
+        self.renderers: dict[str, Callable[[Any], str]] = {}
+        self.paused = False
+        self.skipped = 0
+
+    def renderer(
+        self, name: str
+    ) -> Callable[[Callable[[Any], str]], Callable[[Any], str]]:
+        """Register the function rendering the markup of a segment for a screen"""
+
+        def register(func: Callable[[Any], str]) -> Callable[[Any], str]:
+            self.renderers[name] = func
+            return func
+
+        return register
+
+    def update(self, screens: dict[str, Any]) -> None:
+        """Follow the outputs that are connected, given their screens by name"""
+        for output in self.bars.keys() - screens.keys():
+            bar = self.bars.pop(output)
+            bar.cancel()
+            bar.channel.close()
+
+        self.screens = screens
+
+        for output in screens:
+            if output not in self.bars:
+                bar = StatusBar(
+                    StatusChannel(self.path.format(output=output)),
+                    self.order,
+                    self.separator,
+                    self.delay,
+                )
+                bar.renderers = {
+                    name: functools.partial(self._render, name, output)
+                    for name in self.order
+                }
+                self.bars[output] = bar
+
+            if not self.paused:
+                self.bars[output].schedule(*self.order)
+
+    def _render(self, name: str, output: str) -> str:
+        return self.renderers[name](self.screens[output])
+
+    def schedule(self, screen: Any, *names: str) -> None:
+        """Mark segments of the bar on a screen as dirty"""
+        if self.paused:
+            self.skipped += 1
+            return
+
+        for output, output_screen in self.screens.items():
+            if output_screen is screen:
+                self.bars[output].schedule(*names)
+
+    def schedule_all(self, *names: str) -> None:
+        """Mark segments of every bar as dirty"""
+        if self.paused:
+            self.skipped += 1
+            return
+
+        for bar in self.bars.values():
+            bar.schedule(*names)
+
+    def pause(self) -> None:
+        """Stop updating the bars, dropping what is pending"""
+        self.paused = True
+        for bar in self.bars.values():
+            bar.cancel()
+
+    def resume(self) -> None:
+        """Update the bars again, starting with everything"""
+        self.paused = False
+        self.schedule_all(*self.order)
+
+    @property
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Statistics of each bar"""
+        return {output: bar.stats for output, bar in self.bars.items()}
+
+    def flush(self) -> None:
+        """Publish pending changes of every bar right away"""
+        for bar in self.bars.values():
+            if bar.dirty:
+                bar.cancel()
+                bar.flush()
+
+    def close(self) -> None:
+        """Drop pending changes and close every socket
+
+        Each bar refers back to these bars through its renderers, so the
+        bars are dropped as well, leaving nothing for a cyclic collection."""
+        for bar in self.bars.values():
+            bar.cancel()
+            bar.channel.close()
+            bar.renderers.clear()
+
+        self.bars.clear()
+        self.screens = {}
@@ -0,0 +1,142 @@
+"""
+Starting and supervising session services
+"""
+
+from __future__ import annotations
+
+import asyncio
+import shlex
+import time
+
+from libqtile.log_utils import logger
+from libqtile.utils import create_task
+
+
+class Service:
+    """A program started with the session
+
+    Oneshot services are expected to exit, anything else is restarted when
+    it dies."""
+
+    def __init__(
+        self,
+        name: str,
+        command: str,
+        oneshot: bool = False,
+    ) -> None:
+        self.name = name
+        self.argv = shlex.split(command)
+        self.oneshot = oneshot
+        self.process: asyncio.subprocess.Process | None = None
+        self.ready = asyncio.Event()
+        self.restarts = 0
+        self.latency: float | None = None
+
+
+class Supervisor:
+    """Launches services concurrently and restarts the ones that crash"""
+
+    def __init__(
+        self,
+        backoff: float = 1,
+        max_backoff: float = 60,
+        stable_after: float = 30,
+    ) -> None:
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.services: dict[str, Service] = {}
+        self.started_at = 0.0
+        self.stopping = False
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self, services: list[Service]) -> None:
+        """Start all services at once"""
+        self.started_at = time.monotonic()
+        self.services.update((service.name, service) for service in services)
+
+        for service in services:
+            task = create_task(self._supervise(service))
+            if task is not None:
+                self._tasks.append(task)
+
+        create_task(self._report())
+
+    async def _supervise(self, service: Service) -> None:
+        failures = 0
+
+        while not self.stopping:
+            launched = time.monotonic()
+
+            try:
+                service.process = await asyncio.create_subprocess_exec(*service.argv)
+            except OSError:
+                logger.exception("Unable to start %s", service.name)
+                service.ready.set()
+                return
+
+            if service.latency is None:
+                service.latency = time.monotonic() - self.started_at
+
+            if not service.oneshot:
+                service.ready.set()
+
+            returncode = await service.process.wait()
+
+            if service.oneshot:
+                service.ready.set()
+                return
+
+            if self.stopping:
+                return
+
+            if time.monotonic() - launched > self.stable_after:
+                failures = 0
+
+            delay = min(self.backoff * 2**failures, self.max_backoff)
+            failures += 1
+            service.restarts += 1
+            logger.warning(
+                "%s exited with %s, restarting in %ss", service.name, returncode, delay
+            )
+            await asyncio.sleep(delay)
+
+    async def _report(self) -> None:
+        """Log how long it took until every service was running"""
+        await asyncio.gather(
+            *(service.ready.wait() for service in self.services.values())
+        )
+        logger.info("Session services started in %.3fs", self.latencies()["total"])
+
+    def pid(self, name: str) -> int | None:
+        """The process of a service, while it runs"""
+        service = self.services.get(name)
+        if service is None or service.process is None:
+            return None
+        if service.process.returncode is not None:
+            return None
+        return service.process.pid
+
+    def latencies(self) -> dict[str, float]:
+        """Seconds from session start until each service was launched"""
+        latencies = {
+            name: service.latency
+            for name, service in self.services.items()
+            if service.latency is not None
+        }
+        latencies["total"] = max(latencies.values(), default=0.0)
+        return latencies
+
+    def stop(self) -> None:
+        """Terminate the services themselves, not a shell around them"""
+        self.stopping = True
+
+        for task in self._tasks:
+            task.cancel()
+
+        for service in self.services.values():
+            if service.process is not None and service.process.returncode is None:
+                try:
+                    service.process.terminate()
+                except ProcessLookupError:
+                    pass
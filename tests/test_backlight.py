@@ -0,0 +1,142 @@
+"""
+Backlight against a backlight device made up under tmp_path
+
+    python -m pytest tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+import builtins
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import backlight as backlight_module
+from backlight import Backlight
+
+
+class Bus:
+    """The part of a dbus_next MessageBus the fallback uses, keeping what was sent"""
+
+    def __init__(self) -> None:
+        self.sent: list[Any] = []
+
+    def send(self, message: Any) -> None:
+        self.sent.append(message)
+
+
+def make_device(
+    root: Path, name: str = "intel_backlight", brightness: int = 50, maximum: int = 100
+) -> Path:
+    device = root / name
+    device.mkdir(parents=True)
+    (device / "brightness").write_text(f"{brightness}\n")
+    (device / "max_brightness").write_text(f"{maximum}\n")
+    return device
+
+
+def brightness(device: Path) -> int:
+    return int((device / "brightness").read_text())
+
+
+async def settle(seconds: float = 0.05) -> None:
+    await asyncio.sleep(seconds)
+
+
+def test_reads_the_first_device(tmp_path: Path) -> None:
+    make_device(tmp_path, "b_backlight", brightness=10, maximum=200)
+    make_device(tmp_path, "a_backlight", brightness=30, maximum=120)
+
+    light = Backlight(root=str(tmp_path))
+    light.find()
+
+    assert light.device == "a_backlight"
+    assert light.max_brightness == 120
+    assert light.brightness == 30
+
+
+def test_no_device_does_nothing(tmp_path: Path) -> None:
+    light = Backlight(root=str(tmp_path / "missing"))
+
+    light.set_percent(50)
+    light.change(10)
+
+    assert light.device is None
+
+
+def test_change_starts_from_the_brightness_read_again(tmp_path: Path) -> None:
+    device = make_device(tmp_path, brightness=50)
+    light = Backlight(root=str(tmp_path))
+    light.find()
+
+    # Something else sets the brightness after it was first read
+    (device / "brightness").write_text("20\n")
+    light.change(10)
+
+    assert brightness(device) == 30
+
+
+def test_brightness_is_clamped(tmp_path: Path) -> None:
+    device = make_device(tmp_path, brightness=50, maximum=100)
+    light = Backlight(root=str(tmp_path))
+
+    light.set_percent(150)
+    assert brightness(device) == 100
+
+    light.change(-200)
+    assert brightness(device) == 0
+
+
+def test_ramp_is_written_in_steps(tmp_path: Path) -> None:
+    async def run() -> None:
+        device = make_device(tmp_path, brightness=0, maximum=100)
+        light = Backlight(root=str(tmp_path), delay=0.005, ramp_time=0.025)
+
+        light.set_percent(100)
+        assert light._steps == [20, 40, 60, 80, 100]
+        assert light.target == 100
+        assert brightness(device) == 0
+
+        await settle()
+        assert brightness(device) == 100
+        assert not light._steps
+
+    asyncio.run(run())
+
+
+def test_falls_back_to_logind_without_permission(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    device = make_device(tmp_path, brightness=50)
+    (device / "brightness").chmod(0o444)
+
+    # The mode is no use when the tests run as root, so writes are refused here too
+    def read_only(path: Any, mode: str = "r", *args: Any, **kwargs: Any) -> Any:
+        if "w" in mode and os.fspath(path) == str(device / "brightness"):
+            raise PermissionError(path)
+        return builtins.open(path, mode, *args, **kwargs)
+
+    monkeypatch.setattr(backlight_module, "open", read_only, raising=False)
+
+    async def run() -> None:
+        light = Backlight(root=str(tmp_path), delay=0.001)
+        bus = Bus()
+        light.bus = bus  # type: ignore[assignment]
+
+        light.set_percent(80)
+        await settle()
+        light.set_percent(60)
+        await settle()
+
+        assert light.use_logind
+        assert [message.member for message in bus.sent] == ["SetBrightness"] * 2
+        assert [message.body for message in bus.sent] == [
+            ["backlight", "intel_backlight", 80],
+            ["backlight", "intel_backlight", 60],
+        ]
+        assert brightness(device) == 50
+
+    asyncio.run(run())
@@ -0,0 +1,95 @@
+"""
+Notifier against a stand-in notification server
+
+    python -m pytest tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+from dbus_next.constants import MessageType
+
+from notifications import Notifier
+
+
+class Server:
+    """A connected bus whose calls go to org.freedesktop.Notifications
+
+    Every Notify gets a new id unless it replaces one, and while `down` is
+    set the server answers with an error."""
+
+    def __init__(self) -> None:
+        self.calls: list[Any] = []
+        self.last_id = 0
+        self.down = False
+
+    async def call(self, message: Any) -> SimpleNamespace:
+        self.calls.append(message)
+
+        if self.down:
+            return SimpleNamespace(message_type=MessageType.ERROR, body=[])
+
+        replaces = message.body[1]
+        if not replaces:
+            self.last_id += 1
+        return SimpleNamespace(
+            message_type=MessageType.METHOD_RETURN, body=[replaces or self.last_id]
+        )
+
+
+def test_topic_replaces_its_own_notification() -> None:
+    async def run() -> None:
+        server = Server()
+        notifier = Notifier(bus=server)
+        await notifier.connect()
+
+        await notifier.notify("battery", "Battery", "50%")
+        await notifier.notify("wifi", "Wifi", "connected")
+        await notifier.notify("battery", "Battery", "49%")
+
+        assert [call.member for call in server.calls] == ["Notify"] * 3
+        assert [call.body[1] for call in server.calls] == [0, 0, 1]
+        assert notifier.ids == {"battery": 1, "wifi": 2}
+
+    asyncio.run(run())
+
+
+def test_notification_is_built_from_the_arguments() -> None:
+    async def run() -> None:
+        server = Server()
+        notifier = Notifier(app_name="test", timeout=1000, bus=server)
+
+        await notifier.notify("mic", "Microphone", "Muted", icon="mic", urgency="low")
+
+        app_name, _, icon, summary, body, actions, hints, timeout = server.calls[0].body
+        assert (app_name, icon, summary, body) == ("test", "mic", "Microphone", "Muted")
+        assert actions == []
+        assert hints["urgency"].value == 0
+        assert timeout == 1000
+
+    asyncio.run(run())
+
+
+def test_error_reply_keeps_the_last_id() -> None:
+    async def run() -> None:
+        server = Server()
+        notifier = Notifier(bus=server)
+
+        await notifier.notify("date", "12:00")
+        server.down = True
+        await notifier.notify("date", "12:01")
+
+        assert notifier.ids == {"date": 1}
+
+    asyncio.run(run())
+
+
+def test_nothing_is_posted_without_a_bus() -> None:
+    notifier = Notifier()
+
+    asyncio.run(notifier.notify("date", "12:00"))
+
+    assert notifier.ids == {}
@@ -0,0 +1,132 @@
+"""
+Status notifications against a power_supply tree made up under tmp_path
+
+    python -m pytest tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+from offload import Executor
+from status import StatusNotifications, WifiStatus, battery_status
+
+
+class Notifications:
+    """The Notifier the status is posted to, keeping what was posted"""
+
+    def __init__(self) -> None:
+        self.posted: list[tuple[str, str, str]] = []
+
+    async def connect(self) -> None:
+        pass
+
+    async def notify(self, topic: str, summary: str, body: str = "") -> None:
+        self.posted.append((topic, summary, body))
+
+
+def make_supply(root: Path, name: str, **values: str) -> None:
+    supply = root / name
+    supply.mkdir(parents=True)
+    for key, value in values.items():
+        (supply / key).write_text(f"{value}\n")
+
+
+def notifications(
+    notifier: Notifications, power_supply: Path, **kwargs: Any
+) -> StatusNotifications:
+    return StatusNotifications(
+        notifier,  # type: ignore[arg-type]
+        volume=None,  # type: ignore[arg-type]
+        wifi=WifiStatus(bus=object()),
+        power_supply=str(power_supply),
+        **kwargs,
+    )
+
+
+def test_battery_charging_and_plugged_in(tmp_path: Path) -> None:
+    make_supply(tmp_path, "AC", type="Mains", online="1")
+    make_supply(tmp_path, "BAT0", type="Battery", capacity="80", status="Charging")
+
+    assert battery_status(str(tmp_path)) == (
+        "Battery",
+        "BAT0: 80% charging\nAC plugged in",
+    )
+
+
+def test_battery_discharging_shows_the_time_left(tmp_path: Path) -> None:
+    make_supply(tmp_path, "AC", type="Mains", online="0")
+    make_supply(
+        tmp_path,
+        "BAT0",
+        type="Battery",
+        capacity="50",
+        status="Discharging",
+        energy_now="30000000",
+        power_now="12000000",
+    )
+    make_supply(
+        tmp_path,
+        "BAT1",
+        type="Battery",
+        capacity="20",
+        status="Discharging",
+        charge_now="1000000",
+        current_now="0",
+    )
+
+    assert battery_status(str(tmp_path)) == (
+        "Battery",
+        "BAT0: 50% discharging, 2:30 left\nBAT1: 20% discharging",
+    )
+
+
+def test_no_battery(tmp_path: Path) -> None:
+    make_supply(tmp_path, "AC", type="Mains", online="1")
+
+    assert battery_status(str(tmp_path)) is None
+    assert battery_status(str(tmp_path / "missing")) is None
+
+
+def test_battery_is_posted_as_a_notification(tmp_path: Path) -> None:
+    make_supply(tmp_path, "BAT0", type="Battery", capacity="64", status="Full")
+
+    async def run() -> None:
+        notifier = Notifications()
+        executor = Executor()
+        status = notifications(notifier, tmp_path, executor=executor)
+        await status.connect()
+
+        await status.post("battery")
+
+        assert notifier.posted == [("battery", "Battery", "BAT0: 64% full")]
+        executor.close()
+
+    asyncio.run(run())
+
+
+def test_no_battery_is_posted_too(tmp_path: Path) -> None:
+    async def run() -> None:
+        notifier = Notifications()
+        status = notifications(notifier, tmp_path)
+
+        await status.post("battery")
+
+        assert notifier.posted == [("battery", "Battery", "No battery")]
+
+    asyncio.run(run())
+
+
+def test_failing_topic_posts_nothing(tmp_path: Path) -> None:
+    async def run() -> None:
+        notifier = Notifications()
+        status = notifications(notifier, tmp_path)
+
+        # Without a volume controller, toggling the microphone raises
+        await status.post("mic")
+
+        assert notifier.posted == []
+
+    asyncio.run(run())
@@ -0,0 +1,189 @@
+"""
+VolumeController against a stand-in audio server
+
+    python -m pytest tests
+"""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from volume import VolumeController
+
+
+class Server:
+    """The parts of PulseAsync the controller uses, backed by plain attributes
+
+    `stop` ends the connection the way a restarting PipeWire does, and while
+    `down` is set connecting fails."""
+
+    def __init__(self, volume: float = 0.5) -> None:
+        self.sinks = {
+            "speakers": SimpleNamespace(
+                index=0, mute=False, volume=SimpleNamespace(value_flat=volume)
+            ),
+            "headphones": SimpleNamespace(
+                index=1, mute=False, volume=SimpleNamespace(value_flat=volume)
+            ),
+        }
+        self.default_sink = "speakers"
+        self.down = False
+        self.connects = 0
+        self.events: asyncio.Queue | None = None
+
+    async def connect(self) -> None:
+        if self.down:
+            raise OSError("Failed to connect to pulseaudio server")
+        self.connects += 1
+        self.events = asyncio.Queue()
+
+    def disconnect(self) -> None:
+        self.events = None
+
+    def close(self) -> None:
+        self.events = None
+
+    async def server_info(self) -> SimpleNamespace:
+        return SimpleNamespace(
+            default_sink_name=self.default_sink, default_source_name="mic"
+        )
+
+    async def subscribe_events(self, *_masks: str):
+        assert self.events is not None, "Events are only sent while connected"
+        while True:
+            event = await self.events.get()
+            if event is None:
+                raise OSError("Connection terminated")
+            yield event
+
+    async def get_sink_by_name(self, name: str) -> SimpleNamespace:
+        return self.sinks[name]
+
+    async def sink_volume_set(self, index: int, volume: SimpleNamespace) -> None:
+        sink = next(sink for sink in self.sinks.values() if sink.index == index)
+        sink.volume = SimpleNamespace(value_flat=volume.value_flat)
+
+    async def sink_mute(self, index: int, mute: bool) -> None:
+        sink = next(sink for sink in self.sinks.values() if sink.index == index)
+        sink.mute = mute
+
+    def set_default(self, name: str) -> None:
+        self.default_sink = name
+        assert self.events is not None, "Events are only sent while connected"
+        self.events.put_nowait("change")
+
+    def stop(self) -> None:
+        assert self.events is not None, "Only a connected server can stop"
+        self.events.put_nowait(None)
+
+
+async def settle(seconds: float = 0.05) -> None:
+    await asyncio.sleep(seconds)
+
+
+def controller(server: Server, **kwargs: float) -> VolumeController:
+    return VolumeController(delay=0.001, backoff=0.01, client=server, **kwargs)
+
+
+def test_keys_are_batched_into_one_change() -> None:
+    async def run() -> None:
+        server = Server(0.5)
+        volume = controller(server)
+        await volume.connect()
+        await settle()
+
+        for _ in range(3):
+            volume.change(1)
+        await settle()
+
+        assert round(server.sinks["speakers"].volume.value_flat, 2) == 0.65
+        volume.close()
+
+    asyncio.run(run())
+
+
+def test_raising_stops_at_the_limit() -> None:
+    async def run() -> None:
+        server = Server(0.98)
+        volume = controller(server)
+        await volume.connect()
+        await settle()
+
+        volume.change(1)
+        await settle()
+
+        assert server.sinks["speakers"].volume.value_flat == 1.0
+        volume.close()
+
+    asyncio.run(run())
+
+
+def test_sink_above_the_limit_is_not_pulled_down() -> None:
+    async def run() -> None:
+        server = Server(1.2)
+        volume = controller(server)
+        await volume.connect()
+        await settle()
+
+        volume.change(1)
+        await settle()
+        assert server.sinks["speakers"].volume.value_flat == 1.2
+
+        volume.change(-1)
+        await settle()
+        assert round(server.sinks["speakers"].volume.value_flat, 2) == 1.15
+        volume.close()
+
+    asyncio.run(run())
+
+
+def test_follows_the_default_sink() -> None:
+    async def run() -> None:
+        server = Server()
+        volume = controller(server)
+        await volume.connect()
+        await settle()
+
+        server.set_default("headphones")
+        await settle()
+        assert volume.sink_name == "headphones"
+
+        volume.toggle_mute()
+        await settle()
+        assert server.sinks["headphones"].mute
+        assert not server.sinks["speakers"].mute
+        volume.close()
+
+    asyncio.run(run())
+
+
+def test_connects_again_after_the_server_restarts() -> None:
+    async def run() -> None:
+        server = Server()
+        volume = controller(server)
+        await volume.connect()
+        await settle()
+
+        server.down = True
+        server.stop()
+        await settle()
+        assert volume.sink_name is None
+
+        # Keys pressed without a server are dropped
+        volume.change(1)
+        await settle()
+        assert server.sinks["speakers"].volume.value_flat == 0.5
+
+        server.down = False
+        server.default_sink = "headphones"
+        await settle(0.3)
+        assert server.connects == 2
+        assert volume.sink_name == "headphones"
+
+        volume.change(1)
+        await settle()
+        assert round(server.sinks["headphones"].volume.value_flat, 2) == 0.55
+        volume.close()
+
+    asyncio.run(run())
@@ -0,0 +1,105 @@
+"""
+Deciding what an urgent window gets to do
+"""
+
+from __future__ import annotations
+
+import time
+from enum import Enum
+from typing import TYPE_CHECKING
+
+from rules import PlacementRules
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from libqtile.backend.base import Window
+
+
+class Urgency(Enum):
+    FOCUS = "focus"
+    FLAG = "flag"
+    IGNORE = "ignore"
+
+
+class UrgencyPolicy:
+    """Urgency actions per application class, with rate limiting
+
+    Classes are matched by prefix like the group assignments, first rule
+    wins. A client acts at most once per `cooldown` seconds, and focusing
+    anything happens at most once per `focus_interval` seconds whichever
+    client asks, so a storm of urgent hints can't chain group switches.
+    Flagged windows are kept until they are focused or killed."""
+
+    def __init__(
+        self,
+        policies: dict[Urgency, tuple[str, ...]],
+        default: Urgency = Urgency.FLAG,
+        cooldown: float = 5,
+        focus_interval: float = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rules = PlacementRules(
+            {action.value: classes for action, classes in policies.items()}
+        )
+        self.default = default
+        self.cooldown = cooldown
+        self.focus_interval = focus_interval
+        self.clock = clock
+        self.acted: dict[int, float] = {}
+        self.focused = -focus_interval
+        self.flagged: dict[int, Window] = {}
+        self.stats: dict[str, int] = {"hints": 0, "acted": 0, "limited": 0}
+
+    def action(self, window: Window) -> Urgency:
+        """What the policy table says for the class of a window"""
+        wm_class = window.get_wm_class()
+        action = None if wm_class is None else self.rules.match(wm_class)
+        return self.default if action is None else Urgency(action)
+
+    def decide(self, window: Window) -> Urgency:
+        """The action to take on an urgent hint, IGNORE while rate limited"""
+        self.stats["hints"] += 1
+
+        if not getattr(window, "urgent", True):
+            return Urgency.IGNORE
+
+        action = self.action(window)
+        if action is Urgency.IGNORE:
+            return action
+
+        now = self.clock()
+        if now - self.acted.get(window.wid, -self.cooldown) < self.cooldown:
+            self.stats["limited"] += 1
+            return Urgency.IGNORE
+
+        if action is Urgency.FOCUS and now - self.focused < self.focus_interval:
+            # Somebody else just took focus, so only flag this one
+            action = Urgency.FLAG
+
+        self.acted[window.wid] = now
+        self.stats["acted"] += 1
+
+        if action is Urgency.FOCUS:
+            self.focused = now
+        else:
+            self.flagged[window.wid] = window
+
+        return action
+
+    def unflag(self, window: Window) -> bool:
+        """Forget the flag of a window that got focused, True if it had one"""
+        return self.flagged.pop(window.wid, None) is not None
+
+    def forget(self, window: Window) -> None:
+        """Forget everything about a killed window"""
+        self.acted.pop(window.wid, None)
+        self.flagged.pop(window.wid, None)
+
+    def flagged_groups(self) -> set[str]:
+        """Names of the groups that have a flagged window"""
+        return {
+            window.group.name
+            for window in self.flagged.values()
+            if window.group is not None
+        }
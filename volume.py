@@ -0,0 +1,193 @@
+"""
+Controlling volume over a persistent audio server connection
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+from libqtile.utils import create_task
+
+try:
+    from pulsectl import PulseDisconnected, PulseError
+    from pulsectl_asyncio import PulseAsync
+
+    has_pulse = True
+    # A lost socket shows up as OSError as well
+    PULSE_ERRORS: tuple[type[Exception], ...] = (PulseError, PulseDisconnected, OSError)
+except (ImportError, OSError):
+    # pulsectl raises OSError when libpulse itself is missing
+    has_pulse = False
+    PULSE_ERRORS = (OSError,)
+
+if TYPE_CHECKING:
+    from typing import Any
+
+
+class VolumeController:
+    """Keeps one connection to PulseAudio or PipeWire and follows the default sink
+
+    Key presses only add to a pending change. Pending changes are applied
+    in order as a single request per tick, so holding a volume key sends one
+    request per tick instead of one process per key repeat.
+
+    When the server goes away, as it does when PipeWire is restarted, the
+    connection is made again after `backoff` seconds, doubling up to
+    `max_backoff` for as long as it fails. Keys do nothing in the meantime.
+
+    Any client with the same coroutines as `PulseAsync` can be passed in, to
+    run against a stand-in server."""
+
+    def __init__(
+        self,
+        step: float = 0.05,
+        limit: float = 1.0,
+        delay: float = 0.02,
+        backoff: float = 1,
+        max_backoff: float = 30,
+        client: Any = None,
+    ) -> None:
+        self.step = step
+        self.limit = limit
+        self.delay = delay
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pulse = client
+        self.sink_name: str | None = None
+        self.source_name: str | None = None
+        self.pending_volume = 0.0
+        self.pending_mute = False
+        self._handle: asyncio.TimerHandle | None = None
+        self._lock = asyncio.Lock()
+        self._watcher: asyncio.Task | None = None
+        self.reconnects = 0
+
+    async def connect(self) -> None:
+        """Connect to the audio server and keep following the default sink"""
+        if self.pulse is None:
+            if not has_pulse:
+                logger.warning(
+                    "pulsectl-asyncio is not installed. Volume keys will not work."
+                )
+                return
+            self.pulse = PulseAsync("qtile")
+
+        if self._watcher is None:
+            self._watcher = create_task(self._watch_default_sink())
+
+    async def _update_default_sink(self) -> None:
+        info = await self.pulse.server_info()
+        self.sink_name = info.default_sink_name
+        self.source_name = info.default_source_name
+
+    async def _watch_default_sink(self) -> None:
+        """Server events are sent when the default sink changes
+
+        Runs until closed, connecting again whenever the connection is lost."""
+        failures = 0
+
+        while True:
+            try:
+                await self.pulse.connect()
+                await self._update_default_sink()
+                failures = 0
+                async for _event in self.pulse.subscribe_events("server"):
+                    await self._update_default_sink()
+            except PULSE_ERRORS as error:
+                reason: object = error
+            else:
+                reason = "the connection was closed"
+
+            self.sink_name = self.source_name = None
+            with contextlib.suppress(*PULSE_ERRORS):
+                self.pulse.disconnect()
+
+            delay = min(self.backoff * 2**failures, self.max_backoff)
+            failures += 1
+            self.reconnects += 1
+            logger.warning(
+                "No audio server, %s. Connecting again in %ss", reason, delay
+            )
+            await asyncio.sleep(delay)
+
+    def change(self, steps: int) -> None:
+        """Raise or lower the volume by a number of steps"""
+        self.pending_volume += steps * self.step
+        self._schedule()
+
+    def toggle_mute(self) -> None:
+        """Mute or unmute the default sink"""
+        self.pending_mute = not self.pending_mute
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._handle is not None:
+            return
+
+        self._handle = asyncio.get_running_loop().call_later(
+            self.delay, lambda: create_task(self.flush())
+        )
+
+    async def flush(self) -> None:
+        """Apply everything that is pending as one request per setting"""
+        self._handle = None
+
+        # Changes that arrive while a request is on its way wait for the next one
+        async with self._lock:
+            volume, self.pending_volume = self.pending_volume, 0.0
+            mute, self.pending_mute = self.pending_mute, False
+
+            if self.sink_name is None or not (volume or mute):
+                return
+
+            try:
+                sink = await self.pulse.get_sink_by_name(self.sink_name)
+
+                if volume:
+                    sink.volume.value_flat = self._level(sink.volume.value_flat, volume)
+                    await self.pulse.sink_volume_set(sink.index, sink.volume)
+
+                if mute:
+                    await self.pulse.sink_mute(sink.index, not sink.mute)
+            except PULSE_ERRORS:
+                logger.exception("Unable to change volume")
+
+    def _level(self, current: float, change: float) -> float:
+        """The volume after a change, which doesn't raise it past the limit
+
+        A sink that is already above the limit, turned up by something else,
+        is left where it is rather than pulled down to the limit."""
+        level = max(current + change, 0.0)
+        if change > 0:
+            level = min(level, max(current, self.limit))
+        return level
+
+    async def toggle_source_mute(self) -> bool | None:
+        """Mute or unmute the default source, returning whether it is muted now"""
+        if self.source_name is None:
+            return None
+
+        try:
+            source = await self.pulse.get_source_by_name(self.source_name)
+            await self.pulse.source_mute(source.index, not source.mute)
+        except PULSE_ERRORS:
+            logger.exception("Unable to toggle the microphone")
+            return None
+
+        return not source.mute
+
+    def close(self) -> None:
+        """Stop following the default sink and disconnect"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+        if self.pulse is not None:
+            self.pulse.close()
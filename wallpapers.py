@@ -0,0 +1,178 @@
+"""
+Wallpapers and blurred lock screen images
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import os
+import random
+
+from libqtile.log_utils import logger
+
+from watch import Watcher
+
+LOCK_IMAGE = "/tmp/lock_img.jpg"
+
+
+class WallpaperIndex:
+    """Files in the wallpaper directory, listed when first needed
+
+    The listing is kept until inotify reports a change in the directory.
+    Without inotify it is listed again whenever it is used."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._images: list[str] | None = None
+        self._watcher: Watcher | None = None
+
+    @property
+    def images(self) -> list[str]:
+        """Full paths of all wallpapers"""
+        if self._watcher is None:
+            self._watcher = Watcher(self.directory, self._invalidate)
+
+        if self._images is None or not self._watcher.active:
+            try:
+                names = sorted(os.listdir(self.directory))
+            except FileNotFoundError:
+                logger.warning("Wallpaper directory %s is missing", self.directory)
+                names = []
+
+            self._images = [os.path.join(self.directory, name) for name in names]
+
+        return self._images
+
+    def _invalidate(self) -> None:
+        self._images = None
+
+    def random(self) -> str | None:
+        """Pick a random wallpaper, if there are any"""
+        images = self.images
+        return random.choice(images) if images else None
+
+    def close(self) -> None:
+        """Stop watching the directory"""
+        if self._watcher is not None:
+            self._watcher.close()
+
+
+class LockImages:
+    """Blurred copies of wallpapers for the lock screen
+
+    Blurred images are cached on disk keyed on the path, mtime and size of
+    the wallpaper, so a wallpaper is only blurred once. Missing images are
+    made at the lowest priority, a few at a time. Images of wallpapers that
+    were changed or removed since are pruned."""
+
+    def __init__(self, cache_dir: str, blur: str = "16x8", workers: int = 1) -> None:
+        self.cache_dir = cache_dir
+        self.blur = blur
+        self._workers = asyncio.Semaphore(workers)
+        self._jobs: dict[str, asyncio.Task] = {}
+
+    def cached(self, wallpaper: str) -> str:
+        """Where the blurred image of a wallpaper is kept"""
+        stat = os.stat(wallpaper)
+        key = f"{os.path.abspath(wallpaper)}\0{stat.st_mtime_ns}\0{stat.st_size}"
+        digest = hashlib.sha1(key.encode(), usedforsecurity=False).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.jpg")
+
+    async def prepare(self, wallpaper: str, link: str = LOCK_IMAGE) -> None:
+        """Point the lock image at the blurred wallpaper, blurring it if needed"""
+        try:
+            image = self.cached(wallpaper)
+        except OSError:
+            logger.warning("Unable to read wallpaper %s", wallpaper)
+            return
+
+        if not os.path.exists(image) and not await self._blur(wallpaper, image):
+            return
+
+        # Swap the link in one go so the lock screen never sees it missing
+        temporary = f"{link}.{os.getpid()}"
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temporary)
+        os.symlink(image, temporary)
+        os.replace(temporary, link)
+
+    async def warm(self, wallpapers: list[str]) -> None:
+        """Blur every wallpaper that is not cached yet"""
+        for wallpaper in wallpapers:
+            with contextlib.suppress(OSError):
+                image = self.cached(wallpaper)
+                if not os.path.exists(image):
+                    await self._blur(wallpaper, image)
+
+    def prune(self, wallpapers: list[str], link: str = LOCK_IMAGE) -> int:
+        """Remove the images that belong to none of the wallpapers, returning how many
+
+        The image the lock screen points at and the ones being made are kept.
+        Without any wallpapers nothing is removed, the directory may just be
+        missing for a moment."""
+        if not wallpapers:
+            return 0
+
+        keep = {link, *self._jobs}
+        for wallpaper in wallpapers:
+            with contextlib.suppress(OSError):
+                keep.add(self.cached(wallpaper))
+        keep = {os.path.realpath(path) for path in keep}
+
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        for name in names:
+            image = os.path.join(self.cache_dir, name)
+            if os.path.realpath(image) in keep or name.endswith(".part.jpg"):
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(image)
+                removed += 1
+
+        if removed:
+            logger.info("Removed %d blurred images of old wallpapers", removed)
+
+        return removed
+
+    def _blur(self, wallpaper: str, image: str) -> asyncio.Task:
+        # Somebody asking for an image that is already being made waits for it
+        if image not in self._jobs:
+            self._jobs[image] = asyncio.create_task(self._run_blur(wallpaper, image))
+            self._jobs[image].add_done_callback(lambda _: self._jobs.pop(image, None))
+
+        return self._jobs[image]
+
+    async def _run_blur(self, wallpaper: str, image: str) -> bool:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        partial = f"{image}.part.jpg"
+
+        async with self._workers:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    "nice",
+                    "-n",
+                    "19",
+                    "magick",
+                    wallpaper,
+                    "-blur",
+                    self.blur,
+                    partial,
+                )
+            except OSError:
+                logger.exception("Unable to blur %s", wallpaper)
+                return False
+
+            if await process.wait() != 0:
+                logger.warning("Blurring %s failed", wallpaper)
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(partial)
+                return False
+
+        os.replace(partial, image)
+        return True
@@ -0,0 +1,270 @@
+"""
+Keeping terminals and scratchpads warm
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import shlex
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+
+from supervisor import Service
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from libqtile.backend.base import Window
+    from libqtile.core.manager import Qtile
+    from libqtile.scratchpad import ScratchPad
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# What the pool uses of libqtile.scratchpad.ScratchPad that isn't public
+SCRATCHPAD_INTERNALS = ("_dropdownconfig", "_spawned", "_to_hide", "_spawn")
+
+
+class TerminalServer:
+    """A foot server, so new terminals are clients of an already running process
+
+    A client only asks the server for a window, skipping the startup of a
+    whole terminal. Commands fall back to a standalone terminal while the
+    server isn't listening."""
+
+    name = "terminal server"
+
+    def __init__(
+        self, socket_path: str, terminal: str = "foot", client: str = "footclient"
+    ) -> None:
+        self.socket_path = socket_path
+        self.terminal = terminal
+        self.client = client
+
+    def service(self) -> Service:
+        """The server, to be supervised with the session services"""
+        return Service(self.name, f"{self.terminal} --server={self.socket_path}")
+
+    @property
+    def listening(self) -> bool:
+        return os.path.exists(self.socket_path)
+
+    def _client(self, args: tuple[str, ...]) -> str:
+        return shlex.join(
+            (self.client, "--no-wait", f"--server-socket={self.socket_path}") + args
+        )
+
+    def _standalone(self, args: tuple[str, ...]) -> str:
+        return shlex.join((self.terminal,) + args)
+
+    def command(self, *args: str, app_id: str | None = None) -> str:
+        """Open a terminal, through the server if it's up"""
+        if app_id is not None:
+            args = (f"--app-id={app_id}", *args)
+        return self._client(args) if self.listening else self._standalone(args)
+
+    def fallback_command(self, *args: str, app_id: str | None = None) -> str:
+        """Like `command`, deciding when it is run rather than now
+
+        For commands stored in the config, like those of the dropdowns. The
+        client doesn't wait for the terminal, so it only fails when the
+        server can't be reached."""
+        if app_id is not None:
+            args = (f"--app-id={app_id}", *args)
+        fallback = f"{self._client(args)} || exec {self._standalone(args)}"
+        return shlex.join(("sh", "-c", fallback))
+
+
+def process_rss(pid: int) -> int:
+    """Resident memory in bytes of a process and all of its descendants"""
+    try:
+        with open(f"/proc/{pid}/statm", encoding="ascii") as statm:
+            rss = int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+    children: list[int] = []
+    with contextlib.suppress(OSError):
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", encoding="ascii") as f:
+                children.extend(int(child) for child in f.read().split())
+
+    return rss + sum(process_rss(child) for child in children)
+
+
+class WarmPool:
+    """Spawns scratchpad dropdowns hidden, before they are first toggled
+
+    qtile only spawns a dropdown's program on the first toggle, so opening
+    it pays for the whole startup. The first `size` dropdowns in `names` are
+    spawned in the background instead, the same way qtile brings dropdowns
+    back hidden after a restart, and spawned again a while after their
+    window is closed. Nothing is spawned while the processes behind the
+    pooled windows use more than `memory_limit` MiB.
+
+    Windows of dropdowns that are clients of a terminal server belong to
+    the server, which `shared` gives the pid of. Its memory is that of the
+    whole terminal session rather than the pool's, so it isn't counted.
+
+    Warming relies on private ScratchPad attributes, so if a qtile release
+    moves them the pool logs it and stops warming. The dropdowns are then
+    spawned by qtile on their first toggle, as without the pool."""
+
+    def __init__(
+        self,
+        qtile: Qtile,
+        names: tuple[str, ...],
+        scratchpad: str = "scratchpad",
+        size: int = 2,
+        memory_limit: int = 512,
+        delay: float = 2,
+        shared: Callable[[], int | None] | None = None,
+    ) -> None:
+        self.qtile = qtile
+        self.names = names
+        self.scratchpad = scratchpad
+        self.size = size
+        self.memory_limit = memory_limit
+        self.delay = delay
+        self.shared = shared
+        self.stats: dict[str, int] = {"spawned": 0, "refills": 0, "over_limit": 0}
+        self._handle: asyncio.TimerHandle | None = None
+        self.enabled = True
+
+    @property
+    def pooled(self) -> tuple[str, ...]:
+        return self.names[: self.size]
+
+    def _group(self) -> ScratchPad | None:
+        """The scratchpad, while its internals are where the pool expects them"""
+        if not self.enabled:
+            return None
+
+        scratchpad = self.qtile.groups_map.get(self.scratchpad)
+        if scratchpad is None:
+            return None
+
+        missing = [
+            name for name in SCRATCHPAD_INTERNALS if not hasattr(scratchpad, name)
+        ]
+        if missing:
+            logger.warning("Not warming dropdowns, ScratchPad has no %s", missing)
+            self.enabled = False
+            self.close()
+            return None
+
+        return scratchpad  # type: ignore[return-value]
+
+    def memory(self) -> int:
+        """Resident memory in bytes behind the windows of the pool"""
+        scratchpad = self._group()
+        if scratchpad is None:
+            return 0
+
+        pids = set()
+        shared = self.shared() if self.shared is not None else None
+        for name in self.pooled:
+            if (dropdown := scratchpad.dropdowns.get(name)) is not None:
+                pid = dropdown.window.get_pid()
+                if pid and pid != shared:
+                    pids.add(pid)
+
+        return sum(process_rss(pid) for pid in pids)
+
+    def warming(self, window: Window) -> bool:
+        """Whether a new window is a pooled dropdown, spawned to be hidden"""
+        scratchpad = self._group()
+        if scratchpad is None:
+            return False
+
+        return any(
+            name in self.pooled
+            and name in scratchpad._to_hide
+            and match.compare(window)
+            for name, match in scratchpad._spawned.items()
+        )
+
+    def fill(self) -> None:
+        """Spawn every pooled dropdown that has neither a window nor a process"""
+        self._handle = None
+        scratchpad = self._group()
+        if scratchpad is None:
+            return
+
+        missing = [
+            name
+            for name in self.pooled
+            if name in scratchpad._dropdownconfig
+            and name not in scratchpad.dropdowns
+            and name not in scratchpad._spawned
+        ]
+        if not missing:
+            return
+
+        memory = self.memory()
+        if memory > self.memory_limit * 2**20:
+            self.stats["over_limit"] += 1
+            logger.info(
+                "Not warming %s, the pool uses %d MiB", missing, memory // 2**20
+            )
+            return
+
+        for name in missing:
+            # The window is hidden as soon as it maps, see ScratchPad.on_client_new
+            scratchpad._to_hide.append(name)
+            scratchpad._spawn(scratchpad._dropdownconfig[name])
+            self.stats["spawned"] += 1
+
+    def toggle(self, name: str) -> None:
+        """Toggle a dropdown, shown as soon as it maps if it is being warmed
+
+        A toggle while the warm spawn is pending would otherwise have its
+        window hidden when it maps, as it is still marked to be hidden."""
+        scratchpad = self._group()
+        if (
+            scratchpad is not None
+            and name in scratchpad._spawned
+            and name in scratchpad._to_hide
+        ):
+            scratchpad._to_hide.remove(name)
+
+        group = self.qtile.groups_map.get(self.scratchpad)
+        if group is not None:
+            group.dropdown_toggle(name)  # type: ignore[attr-defined]
+
+    def schedule(self) -> None:
+        """Fill the pool after the delay, leaving the moment itself alone"""
+        if self._handle is not None:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.fill()
+            return
+
+        self._handle = loop.call_later(self.delay, self.fill)
+
+    def refill(self, window: Window) -> None:
+        """Spawn a pooled dropdown again once its window was closed"""
+        scratchpad = self._group()
+        if scratchpad is None:
+            return
+
+        # Handlers of the config come before the ScratchPad's own, which
+        # forgets the dropdown
+        if any(
+            dropdown.window is window
+            for name, dropdown in scratchpad.dropdowns.items()
+            if name in self.pooled
+        ):
+            self.stats["refills"] += 1
+            self.schedule()
+
+    def close(self) -> None:
+        """Drop a pending fill"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
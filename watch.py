@@ -0,0 +1,109 @@
+"""
+Watching files and directories with inotify
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import ctypes
+import os
+from typing import TYPE_CHECKING
+
+from libqtile.log_utils import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+DIRECTORY_CHANGES = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+try:
+    libc = ctypes.CDLL(None, use_errno=True)
+    has_inotify = hasattr(libc, "inotify_init1")
+except OSError:
+    has_inotify = False
+
+
+class Watcher:
+    """Calls back on the event loop whenever something changes in a path
+
+    The events themselves are thrown away, the callback is expected to look
+    at the path again."""
+
+    def __init__(
+        self, path: str, callback: Callable[[], None], mask: int = DIRECTORY_CHANGES
+    ) -> None:
+        self.path = path
+        self.callback = callback
+        self.fd: int | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        if not has_inotify:
+            logger.warning("inotify is not available, %s is not watched", path)
+            return
+
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.warning(
+                "Unable to start inotify: %s", os.strerror(ctypes.get_errno())
+            )
+            return
+
+        if libc.inotify_add_watch(fd, os.fsencode(path), mask) < 0:
+            logger.warning(
+                "Unable to watch %s: %s", path, os.strerror(ctypes.get_errno())
+            )
+            os.close(fd)
+            return
+
+        self.fd = fd
+
+        with contextlib.suppress(RuntimeError):
+            self.attach(asyncio.get_running_loop())
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start reading events on the event loop"""
+        if self.fd is None or self._loop is not None:
+            return
+
+        self._loop = loop
+        loop.add_reader(self.fd, self._read)
+
+    def _read(self) -> None:
+        assert self.fd is not None, "The watcher should not be read once closed"
+        changed = False
+
+        while True:
+            try:
+                changed |= bool(os.read(self.fd, 4096))
+            except BlockingIOError:
+                break
+
+        if changed:
+            self.callback()
+
+    @property
+    def active(self) -> bool:
+        """Whether changes are actually being reported"""
+        return self._loop is not None
+
+    def close(self) -> None:
+        """Stop watching"""
+        if self.fd is None:
+            return
+
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.remove_reader(self.fd)
+            self._loop = None
+
+        os.close(self.fd)
+        self.fd = None
@@ -0,0 +1,80 @@
+"""
+Looking up windows by their class
+"""
+
+from __future__ import annotations
+
+from itertools import count
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from libqtile.backend.base import Window
+
+
+class ClassIndex:
+    """Windows indexed on their lowercased wm_class items
+
+    Apps are matched the same way spawn_or_focus always did, a window matches
+    if one of its class items is part of the command. Which classes match a
+    command is only worked out once per command and then kept up to date as
+    new classes show up."""
+
+    def __init__(self) -> None:
+        self.classes: dict[str, dict[int, Window]] = {}
+        self.window_classes: dict[int, tuple[str, ...]] = {}
+        self.apps: dict[str, set[str]] = {}
+        self.focused: dict[int, int] = {}
+        self._clock = count(1)
+
+    def add(self, window: Window) -> None:
+        """Index a window, or re-index it if its class changed"""
+        wm_class = window.get_wm_class() or []
+        classes = tuple(item.lower() for item in wm_class if item)
+
+        if self.window_classes.get(window.wid) == classes:
+            return
+
+        self.remove(window)
+        self.window_classes[window.wid] = classes
+        self.focused.setdefault(window.wid, 0)
+
+        for cls in classes:
+            if cls not in self.classes:
+                self.classes[cls] = {}
+                for app, matches in self.apps.items():
+                    if cls in app:
+                        matches.add(cls)
+
+            self.classes[cls][window.wid] = window
+
+    def remove(self, window: Window) -> None:
+        """Drop a window from the index"""
+        for cls in self.window_classes.pop(window.wid, ()):
+            windows = self.classes.get(cls)
+            if windows is not None:
+                windows.pop(window.wid, None)
+
+        self.focused.pop(window.wid, None)
+
+    def focus(self, window: Window) -> None:
+        """Remember the window as the most recently focused of its class"""
+        if window.wid in self.window_classes:
+            self.focused[window.wid] = next(self._clock)
+
+    def find(self, app: str) -> Window | None:
+        """Most recently focused window matching the app command"""
+        app = app.lower()
+
+        if app not in self.apps:
+            self.apps[app] = {cls for cls in self.classes if cls in app}
+
+        found: Window | None = None
+        last_focus = -1
+
+        for cls in self.apps[app]:
+            for wid, window in self.classes[cls].items():
+                if window.group is not None and self.focused[wid] > last_focus:
+                    found = window
+                    last_focus = self.focused[wid]
+
+        return found